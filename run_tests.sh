@@ -1,6 +1,6 @@
 #!/bin/bash
 
-FILES_TO_TYPECHECK=(JeffersonShell.py JeffersonGUI.py)
+FILES_TO_TYPECHECK=(JeffersonShell.py JeffersonGUI.py JeffersonBatch.py cylinder_tables.py kernel_dispatch.py vectorized_cipher.py ciphertext_statistics.py session_recording.py engine_metrics.py allocation_profiler.py depth_attack.py cylinder_validation.py letter_arrays.py)
 
 REPODIR=$(dirname $0)
 export PYTHONPATH=$REPODIR/src:$PYTHONPATH
@@ -0,0 +1,375 @@
+"""The Jefferson batch runner. It reads a JSONL stream of jobs, one per line,
+such as:
+
+    {"id": "a", "operation": "encrypt", "message": "Hello world",
+     "key": [8, 4, 6, 7, 2, 1, 10, 5, 3, 9], "cylinder": "cylinder.txt"}
+
+'operation' is either 'encrypt' or 'decrypt', and instead of a 'cylinder'
+path a 'cylinder_id' can be given, which is resolved to '<id>.txt' inside the
+cylinder directory. 'id' is optional and copied as is into the result.
+
+Jobs are grouped by cylinder so each cylinder is loaded, validated and
+prepared once (once for identical cylinders in different files), then shared
+with the worker processes, and one JSONL result is written per job, in the
+same order as the input:
+
+    {"index": 0, "id": "a", "ok": true, "result": "XNUEDNRCHN"}
+
+A failing job gets '"ok": false' and an 'error' instead of a 'result', and
+does not stop the other ones.
+
+With '--metrics-file <file>', the engine metrics of the whole batch, the
+worker processes included, are written to file for the Prometheus node
+exporter (see engine_metrics.py).
+"""
+
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from os import cpu_count
+from os.path import join, realpath
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple)
+
+import engine_metrics
+from cylinder_tables import (CylinderTables, attach_cylinder,
+                             cipher_message_with_tables,
+                             decipher_message_with_tables, prepare_cylinder,
+                             publish_cylinder)
+from engine_metrics import (Metrics, enable_metrics, export_metrics,
+                            merge_metrics, reset_metrics,
+                            write_prometheus_textfile)
+from JeffersonShell import load_and_check_cylinder
+from kernel_dispatch import (CIPHER_KERNELS, DECIPHER_KERNELS, average_length,
+                             forced_kernel, prepare_kernel_selection,
+                             select_kernel)
+
+# Type aliases
+Filename = str
+Cylinder = Dict[int, str]
+Job = Dict[str, Any]
+Result = Dict[str, Any]
+IndexedJob = Tuple[int, Job]
+IndexedResult = Tuple[int, Result]
+
+OPERATIONS = {
+    'encrypt': cipher_message_with_tables,
+    'decrypt': decipher_message_with_tables
+}
+# Kernels running a batch of jobs sharing their operation and key
+KERNELS = {'encrypt': CIPHER_KERNELS, 'decrypt': DECIPHER_KERNELS}
+
+
+def main() -> None:
+    """Parse the command line arguments and run the batch."""
+
+    parser = ArgumentParser(
+        description="Encrypt and decrypt a JSONL stream of jobs.")
+    parser.add_argument(
+        'input', nargs='?', default='-', help="jobs file, '-' for stdin")
+    parser.add_argument(
+        '-o', '--output', default='-', help="results file, '-' for stdout")
+    parser.add_argument(
+        '-w', '--workers', type=int, default=cpu_count() or 1,
+        help="number of worker processes, 1 to run everything in-process")
+    parser.add_argument(
+        '-c', '--cylinder-dir', default='.',
+        help="directory where 'cylinder_id' jobs find their cylinders")
+    parser.add_argument(
+        '--chunk-size', type=int, default=1000,
+        help="maximum number of jobs sent at once to a worker")
+    parser.add_argument(
+        '--metrics-file',
+        help="write the engine metrics of the batch, workers included, to "
+        "this Prometheus textfile")
+    arguments = parser.parse_args()
+    if arguments.chunk_size < 1:
+        parser.error("the chunk size must be at least 1")
+    try:
+        forced_kernel()
+    except ValueError as error:
+        parser.error(str(error))
+    if arguments.metrics_file:
+        enable_metrics()
+
+    input_stream = (sys.stdin if arguments.input == '-' else
+                    open(arguments.input, 'r'))
+    output_stream = (sys.stdout if arguments.output == '-' else
+                     open(arguments.output, 'w'))
+    try:
+        for result in run_batch(input_stream, arguments.workers,
+                                arguments.cylinder_dir, arguments.chunk_size):
+            output_stream.write(json.dumps(result) + '\n')
+            output_stream.flush()
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+        if arguments.metrics_file:
+            write_prometheus_textfile(arguments.metrics_file)
+
+
+def run_batch(lines: Iterable[str],
+              workers: int=1,
+              cylinder_dir: Filename='.',
+              chunk_size: int=1000) -> Iterator[Result]:
+    """Run every job of the given JSONL lines and yield their results in the
+    same order as the jobs, as soon as they are available.
+    """
+
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be at least 1.")
+    # Rather than failing every batch of jobs sharing a key
+    forced_kernel()
+
+    groups = {}  # type: Dict[Filename, List[IndexedJob]]
+    early_results = []  # type: List[IndexedResult]
+    number_of_jobs = 0
+    for index, line in enumerate(line for line in lines if line.strip()):
+        number_of_jobs += 1
+        job = None
+        try:
+            job = decode_job(line)
+            check_job(job)
+            cylinder_file = realpath(resolve_cylinder_file(job, cylinder_dir))
+        except ValueError as error:
+            early_results.append((index, error_result(index, job, error)))
+        else:
+            groups.setdefault(cylinder_file, []).append((index, job))
+
+    return reorder_results(
+        run_groups(groups, early_results, workers, chunk_size),
+        number_of_jobs)
+
+
+def decode_job(line: str) -> Job:
+    """Decode a JSONL line into a job."""
+
+    try:
+        job = json.loads(line)
+    except ValueError:
+        raise ValueError("The job is not valid JSON.")
+    if not isinstance(job, dict):
+        raise ValueError("The job must be a JSON object.")
+    return job
+
+
+def check_job(job: Job) -> None:
+    """Check the fields of a job, raise a ValueError if one is wrong."""
+
+    if job.get('operation') not in OPERATIONS:
+        raise ValueError("The operation must be one of: {}.".format(', '.join(
+            sorted(OPERATIONS))))
+    if not isinstance(job.get('message'), str):
+        raise ValueError("The message must be a string.")
+    key = job.get('key')
+    if not (isinstance(key, list) and
+            all(isinstance(number, int) for number in key)):
+        raise ValueError("The key must be a list of integers.")
+
+
+def resolve_cylinder_file(job: Job, cylinder_dir: Filename) -> Filename:
+    """Return the path to the cylinder file of the job."""
+
+    if isinstance(job.get('cylinder'), str):
+        return job['cylinder']
+    if isinstance(job.get('cylinder_id'), str):
+        return join(cylinder_dir, job['cylinder_id'] + '.txt')
+    raise ValueError("The job needs either a 'cylinder' or a 'cylinder_id'.")
+
+
+def run_groups(groups: Dict[Filename, List[IndexedJob]],
+               early_results: List[IndexedResult],
+               workers: int,
+               chunk_size: int) -> Iterator[IndexedResult]:
+    """Run each group of jobs and yield their results in completion order.
+    Every cylinder is loaded once; with more than one worker it is published
+    into shared memory and its jobs are split into chunks among the workers.
+    """
+
+    for indexed_result in early_results:
+        yield indexed_result
+
+    prepared = {}  # type: Dict[str, CylinderTables]
+    if workers <= 1:
+        try:
+            for cylinder_file, indexed_jobs in groups.items():
+                try:
+                    tables = load_tables(cylinder_file, prepared,
+                                         prepare_cylinder)
+                except Exception as error:
+                    for indexed_result in fail_jobs(indexed_jobs, error):
+                        yield indexed_result
+                    continue
+                for indexed_result in run_jobs_with_tables(tables,
+                                                           indexed_jobs):
+                    yield indexed_result
+        finally:
+            for tables in prepared.values():
+                tables.close()
+        return
+
+    # Workers then all find the kernels calibration cached
+    prepare_kernel_selection()
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {}  # type: Dict[Future, List[IndexedJob]]
+            for cylinder_file, indexed_jobs in groups.items():
+                try:
+                    tables = load_tables(cylinder_file, prepared,
+                                         publish_cylinder)
+                except Exception as error:
+                    for indexed_result in fail_jobs(indexed_jobs, error):
+                        yield indexed_result
+                    continue
+                for start in range(0, len(indexed_jobs), chunk_size):
+                    chunk = indexed_jobs[start:start + chunk_size]
+                    futures[executor.submit(run_jobs, tables.name, chunk,
+                                            engine_metrics.ENABLED)] = chunk
+            for future in as_completed(futures):
+                try:
+                    indexed_results, metrics = future.result()
+                except Exception as error:
+                    # e.g. BrokenProcessPool when a worker died
+                    indexed_results = list(fail_jobs(futures[future], error))
+                else:
+                    if metrics is not None:
+                        merge_metrics(metrics)
+                for indexed_result in indexed_results:
+                    yield indexed_result
+    finally:
+        for tables in prepared.values():
+            tables.close()
+            tables.unlink()
+
+
+def load_tables(
+        cylinder_file: Filename, prepared: Dict[str, CylinderTables],
+        prepare: Callable[[Cylinder], CylinderTables]) -> CylinderTables:
+    """Load and validate the cylinder of a file, and return its tables.
+    prepared holds the tables prepared so far by cylinder fingerprint, so
+    files holding the same cylinder share the same tables.
+    """
+
+    cylinder, check = load_and_check_cylinder(cylinder_file)
+    if check.fingerprint not in prepared:
+        prepared[check.fingerprint] = prepare(cylinder)
+    return prepared[check.fingerprint]
+
+
+def run_jobs(tables_name: str,
+             indexed_jobs: List[IndexedJob],
+             collect_metrics: bool=False
+             ) -> Tuple[List[IndexedResult], Optional[Metrics]]:
+    """Worker side: attach to the published cylinder tables and run the given
+    jobs with them. With collect_metrics, the engine metrics of these jobs
+    are returned along, for the parent process to merge them.
+    """
+
+    if collect_metrics:
+        # Only these jobs, not what was inherited or measured before
+        reset_metrics()
+        enable_metrics()
+    with attach_cylinder(tables_name) as tables:
+        indexed_results = list(run_jobs_with_tables(tables, indexed_jobs))
+    return indexed_results, export_metrics() if collect_metrics else None
+
+
+def run_jobs_with_tables(
+        tables: CylinderTables,
+        indexed_jobs: List[IndexedJob]) -> Iterator[IndexedResult]:
+    """Run each job using the prepared tables of its cylinder. Jobs sharing
+    their operation and key are run together, with the kernel
+    kernel_dispatch selects for such a batch.
+    """
+
+    batches = {}  # type: Dict[Tuple[str, Tuple[int, ...]], List[IndexedJob]]
+    for index, job in indexed_jobs:
+        batches.setdefault((job['operation'], tuple(job['key'])),
+                           []).append((index, job))
+
+    for (operation, key), batch in batches.items():
+        messages = [job['message'] for _, job in batch]
+        kernel = ('table' if len(batch) == 1 else
+                  select_kernel(average_length(messages), len(batch)))
+        if kernel != 'table':
+            try:
+                # Only the disks the messages can use, rebuilding the whole
+                # cylinder in every chunk would cost more than the kernel
+                longest = max(len(message) for message in messages)
+                cylinder = tables.to_cylinder(key[:longest])
+                outputs = KERNELS[operation][kernel](messages, list(key),
+                                                     cylinder)
+            except Exception:
+                pass  # Run the jobs one by one below, to tell which failed
+            else:
+                for (index, job), output in zip(batch, outputs):
+                    yield index, success_result(index, job, output)
+                continue
+
+        for index, job in batch:
+            try:
+                output = OPERATIONS[operation](job['message'], job['key'],
+                                               tables)
+            except Exception as error:
+                yield index, error_result(index, job, error)
+            else:
+                yield index, success_result(index, job, output)
+
+
+def fail_jobs(indexed_jobs: List[IndexedJob],
+              error: Exception) -> Iterator[IndexedResult]:
+    """Yield the same error as the result of every given job."""
+
+    for index, job in indexed_jobs:
+        yield index, error_result(index, job, error)
+
+
+def reorder_results(indexed_results: Iterable[IndexedResult],
+                    number_of_results: int) -> Iterator[Result]:
+    """Yield results ordered by index, buffering the ones arriving early."""
+
+    pending = {}  # type: Dict[int, Result]
+    next_index = 0
+    for index, result in indexed_results:
+        pending[index] = result
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+    if next_index != number_of_results:
+        raise RuntimeError("Some job results are missing.")
+
+
+def success_result(index: int, job: Job, output: str) -> Result:
+    """Return the result of a successful job."""
+
+    result = base_result(index, job)
+    result['ok'] = True
+    result['result'] = output
+    return result
+
+
+def error_result(index: int, job: Optional[Job], error: Exception) -> Result:
+    """Return the result of a failed job."""
+
+    result = base_result(index, job)
+    result['ok'] = False
+    result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def base_result(index: int, job: Optional[Job]) -> Result:
+    """Return the fields shared by every result: the index of the job in the
+    input and its id, if any.
+    """
+
+    result = {'index': index}  # type: Result
+    if job is not None and 'id' in job:
+        result['id'] = job['id']
+    return result
+
+
+if __name__ == "__main__":
+    main()
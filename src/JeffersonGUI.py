@@ -5,72 +5,221 @@ user rotates each disks to display the message he later wants to encrypt on the
 '< CLEAR' line.
 When done, clicking on 'Save and exit' write the message on the '< CIPHERED'
 line to a file named 'encrypted-message.txt' in the current working directory.
+Meanwhile, both messages are shown as text at the top of the sidebar, and
+'Copy to file' writes that same file without closing the window.
+
+Set the JEFFERSON_STARTUP_TIMING environment variable to get the time it took
+to display the first frame printed on the standard error. It is counted from
+the end of the imports of this module; run Python with '-X importtime' to see
+what the imports take.
+
+A session can be recorded with '--record <file>', and replayed later with
+'--replay <file>': the recorded inputs are fed back, headless and as fast as
+possible, and the time taken by each frame is reported. This is used to check
+the GUI does not get slower on real sessions.
+
+With '--profile-allocations <file>', allocations are traced and attributed to
+each frame and to the engine hot paths, and the profile is written to file
+(see allocation_profiler.py to read it).
 """
 
+import sys
+from argparse import ArgumentParser
+from os import environ
+from timeit import default_timer
+
 import pygame
-from pygame.locals import *
+from pygame.locals import MOUSEBUTTONUP, QUIT
 
+from component.copy_button import draw_copy_button, generate_copy_button_data
 from component.draw_cylinder import draw_cylinder
 from component.draw_key import draw_key
 from component.enter_key_annotation import draw_enter_key_annotation
 from component.exit_button import draw_exit_button, generate_exit_button_data
 from component.key_selection import (draw_key_selection_buttons,
                                      generate_key_selection_buttons_data)
+from component.message_preview import (draw_message_preview,
+                                       generate_message_preview_data,
+                                       update_message_preview)
 from component.rotation_button import (draw_rotation_buttons,
                                        generate_rotation_buttons_data)
 from component.sidebar_annotation import draw_sidebar_annotation
-from gui_parameters import FPS, WINDOW_CAPTION, WINDOW_DIMENSIONS
+from component.write_text import get_font
+from cylinder_validation import InvalidCylinderError
+from gui_parameters import (BUTTON_FONT_SIZE, FONT_SIZE, FPS,
+                            PREVIEW_FONT_SIZE, WINDOW_CAPTION,
+                            WINDOW_DIMENSIONS)
 from JeffersonShell import is_key_valid, load_cylinder_from_file
+from session_recording import (frame_times_report, load_recording,
+                               record_event, start_recording)
 
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 
+# When the module imports were done, see JEFFERSON_STARTUP_TIMING
+STARTUP_TIME = default_timer()
+
 # GUI globals
 CLOCK = None
+COPY_BUTTON_DATA = None
 CYLINDER = None
 EXIT_BUTTON_DATA = None
+FRAME = 0  # Number of frames drawn so far
 KEY = None
+KEY_SELECTION_BUTTONS_DATA = None
+MESSAGE_PREVIEW_DATA = None
+RECORDING = None
 ROTATION_BUTTONS_DATA = None
+TIME_TO_FIRST_FRAME = None
 WINDOW = None
 
+# Font sizes used by the components, loaded before the window shows up
+FONT_SIZES = (FONT_SIZE, BUTTON_FONT_SIZE, PREVIEW_FONT_SIZE)
+
 
 def main() -> None:
     """Takes care of calling the setup and setting off the drawing loop."""
 
+    global RECORDING
+
+    parser = ArgumentParser(description="Encrypt a message with a cylinder.")
+    parser.add_argument('--record', help="record the session to this file")
+    parser.add_argument('--replay', help="replay the session of this file")
+    parser.add_argument(
+        '--profile-allocations',
+        help="profile allocations and write the profile to this file")
+    arguments = parser.parse_args()
+
+    profiler = None
+    if arguments.profile_allocations:
+        profiler = start_allocation_profiling()
+
+    try:
+        if arguments.replay:
+            replay(arguments.replay)
+            return
+
+        setup()
+        if arguments.record:
+            RECORDING = start_recording(arguments.record, WINDOW.get_size(),
+                                        len(CYLINDER))
+        pass_to_next_frame = True
+        while pass_to_next_frame:
+            pass_to_next_frame = draw()
+            CLOCK.tick(FPS)  # Wait the end of the frame
+    finally:
+        if RECORDING is not None:
+            RECORDING.close()
+        if profiler is not None:
+            stop_allocation_profiling(profiler,
+                                      arguments.profile_allocations)
+
+
+def start_allocation_profiling():
+    """Start tracing allocations, measuring each frame and the engine
+    functions the GUI uses.
+    """
+
+    from allocation_profiler import AllocationProfiler, instrument_engine
+
+    profiler = AllocationProfiler()
+    profiler.start()
+    instrument_engine(profiler)
+    this_module = sys.modules[__name__]
+    profiler.instrument(this_module, 'load_cylinder_from_file')
+    profiler.instrument(this_module, 'draw')
+    return profiler
+
+
+def stop_allocation_profiling(profiler, file: str) -> None:
+    """Stop tracing allocations, save the profile and print its summary."""
+
+    from allocation_profiler import profile_report, save_profile
+
+    profiler.stop()
+    save_profile(profiler.profile, file)
+    print(profile_report(profiler.profile, 5), file=sys.stderr)
+
+
+def replay(file: str) -> None:
+    """Replay a recorded session without showing any window, as fast as
+    possible, then print how long each frame took.
+    """
+
+    header, events_by_frame = load_recording(file)
+    environ.setdefault('SDL_VIDEODRIVER', 'dummy')
     setup()
+    if (header['disks'] != len(CYLINDER) or
+            tuple(header['window']) != WINDOW.get_size()):
+        raise ValueError("The session was recorded with another cylinder or "
+                         "window size.")
+
+    last_frame = max(events_by_frame, default=-1)
+    frame_times = []
+    start = default_timer()
     pass_to_next_frame = True
-    while pass_to_next_frame:
+    while pass_to_next_frame and FRAME <= last_frame:
+        pygame.event.clear()
+        for event in events_by_frame.get(FRAME, []):
+            pygame.event.post(replayed_event(event))
+        frame_start = default_timer()
         pass_to_next_frame = draw()
+        frame_times.append(default_timer() - frame_start)
+    print(
+        frame_times_report(default_timer() - start, frame_times),
+        file=sys.stderr)
 
 
 def setup() -> None:
-    """Initialize pygame and the various GUI globals."""
+    """Initialize pygame and the various GUI globals. Everything that does
+    not need the window is done before opening it, so that the first frame
+    follows its opening as closely as possible.
+    """
 
     global CLOCK
     global CYLINDER
-    global EXIT_BUTTON_DATA
     global KEY
     global KEY_SELECTION_BUTTONS_DATA
-    global ROTATION_BUTTONS_DATA
     global WINDOW
 
-    pygame.init()
+    # Only the modules we use, pygame.init() would start them all
+    pygame.display.init()
+    pygame.font.init()
+
+    try:
+        CYLINDER = load_cylinder_from_file('cylinder.txt', validate=True)
+    except InvalidCylinderError as error:
+        sys.exit(str(error))
+    KEY = []
+    for font_size in FONT_SIZES:
+        get_font(font_size)
 
     WINDOW = pygame.display.set_mode(WINDOW_DIMENSIONS)
     pygame.display.set_caption(WINDOW_CAPTION)
 
     CLOCK = pygame.time.Clock()
 
-    CYLINDER = load_cylinder_from_file('cylinder.txt')
-
-    KEY = []
-
-    ROTATION_BUTTONS_DATA = generate_rotation_buttons_data(
-        CYLINDER, list(range(1, len(CYLINDER) + 1)), WINDOW)
     KEY_SELECTION_BUTTONS_DATA = generate_key_selection_buttons_data(CYLINDER,
                                                                      WINDOW)
+
+
+def setup_rotation() -> None:
+    """Set up the rotation, exit and copy buttons and the message preview,
+    once the key is entered. They are not needed before.
+    """
+
+    global COPY_BUTTON_DATA
+    global EXIT_BUTTON_DATA
+    global MESSAGE_PREVIEW_DATA
+    global ROTATION_BUTTONS_DATA
+
+    ROTATION_BUTTONS_DATA = generate_rotation_buttons_data(CYLINDER, KEY,
+                                                           WINDOW)
     EXIT_BUTTON_DATA = generate_exit_button_data(CYLINDER, KEY, WINDOW)
+    MESSAGE_PREVIEW_DATA = generate_message_preview_data(CYLINDER, KEY,
+                                                         WINDOW)
+    COPY_BUTTON_DATA = generate_copy_button_data(MESSAGE_PREVIEW_DATA, WINDOW)
 
 
 def draw() -> bool:
@@ -79,15 +228,15 @@ def draw() -> bool:
     False to exit the drawing loop.
     """
 
-    global EXIT_BUTTON_DATA
-    global KEY
-    global KEY_SELECTION_BUTTONS_DATA
-    global ROTATION_BUTTONS_DATA
+    global FRAME
+    global TIME_TO_FIRST_FRAME
+
+    frame = FRAME
+    FRAME += 1
 
     key_valid = is_key_valid(KEY, len(CYLINDER))
-    ROTATION_BUTTONS_DATA = generate_rotation_buttons_data(
-        CYLINDER, KEY
-        if key_valid else list(range(1, len(CYLINDER) + 1)), WINDOW)
+    if key_valid and ROTATION_BUTTONS_DATA is None:
+        setup_rotation()
 
     # Redraw UI
     clear_surface(WINDOW)
@@ -98,29 +247,39 @@ def draw() -> bool:
     if key_valid:
         draw_rotation_buttons(ROTATION_BUTTONS_DATA)
         draw_exit_button(EXIT_BUTTON_DATA)
+        draw_copy_button(COPY_BUTTON_DATA)
+        draw_message_preview(MESSAGE_PREVIEW_DATA, WINDOW)
     else:
         draw_key_selection_buttons(KEY_SELECTION_BUTTONS_DATA)
         draw_key(CYLINDER, KEY, WINDOW)
         draw_enter_key_annotation(WINDOW)
     pygame.display.flip()
 
-    # Compute if we can click on the rotation button and finish button
-    for button in ROTATION_BUTTONS_DATA:
-        button['clickable'] = key_valid
-    EXIT_BUTTON_DATA['clickable'] = key_valid
+    if TIME_TO_FIRST_FRAME is None:
+        TIME_TO_FIRST_FRAME = default_timer() - STARTUP_TIME
+        if environ.get('JEFFERSON_STARTUP_TIMING'):
+            print(
+                'First frame displayed after {:.1f} ms'.format(
+                    TIME_TO_FIRST_FRAME * 1000),
+                file=sys.stderr)
 
     # Compute the UI components we can interact onto for this frame
     clickable_components = [
         component
-        for component in ROTATION_BUTTONS_DATA + KEY_SELECTION_BUTTONS_DATA +
-        [EXIT_BUTTON_DATA] if component['clickable']
+        for component in KEY_SELECTION_BUTTONS_DATA + (
+            ROTATION_BUTTONS_DATA + [EXIT_BUTTON_DATA, COPY_BUTTON_DATA]
+            if key_valid else [])
+        if component['clickable']
     ]
 
     # Handle events
     for event in pygame.event.get():
-        if event.type is QUIT:
+        if RECORDING is not None:
+            record_pygame_event(event, frame)
+
+        if event.type == QUIT:
             return False  # Abort program
-        elif event.type is MOUSEBUTTONUP:
+        elif event.type == MOUSEBUTTONUP:
             for clickable_component in clickable_components:
                 abs_component_rect = pygame.Rect(
                     clickable_component['surface'].get_abs_offset(),
@@ -131,15 +290,44 @@ def draw() -> bool:
 
                     if clickable_component['type'] == 'key_selection':
                         KEY.append(clickable_component['disk_number'])
+                    elif clickable_component['type'] == 'rotation':
+                        update_message_preview(
+                            MESSAGE_PREVIEW_DATA, CYLINDER,
+                            clickable_component['disk_number'])
                     elif clickable_component['type'] == 'exit':
                         return False  # We clicked 'Save and exit', exit the
                         # program
 
-                    # Wait the end of the frame
-    CLOCK.tick(FPS)
     return True
 
 
+def record_pygame_event(event, frame: int) -> None:
+    """Append the event to the session recording, if it is one we handle."""
+
+    time = default_timer() - STARTUP_TIME
+    if event.type == QUIT:
+        record_event(RECORDING, frame, time, 'quit')
+    elif event.type == MOUSEBUTTONUP:
+        record_event(
+            RECORDING,
+            frame,
+            time,
+            'mouse_up',
+            pos=list(event.pos),
+            button=event.button)
+
+
+def replayed_event(recorded_event):
+    """Return the pygame event matching a recorded one."""
+
+    if recorded_event['type'] == 'quit':
+        return pygame.event.Event(QUIT)
+    return pygame.event.Event(
+        MOUSEBUTTONUP,
+        pos=tuple(recorded_event['pos']),
+        button=recorded_event.get('button', 1))
+
+
 def clear_surface(surface) -> None:
     """Fill surface with black."""
 
@@ -1,6 +1,11 @@
+from os.path import getsize
 from random import sample
 from string import ascii_letters, ascii_uppercase
-from typing import Dict, List
+from typing import Dict, Iterable, List, Tuple
+
+from cylinder_validation import (CylinderCheck, InvalidCylinderError,
+                                 check_lines)
+from engine_metrics import instrumented
 
 # Type aliases
 Filename = str
@@ -10,6 +15,16 @@ Key = List[int]
 Letter = str
 
 
+class InvalidKeyError(Exception):
+    """Raised when a key is not a permutation of all numbers from 1 to its
+    length.
+    """
+
+
+@instrumented('sanitize', lambda arguments, result: {
+    'sanitized_messages_total': 1,
+    'sanitized_letters_total': len(result)
+})
 def sanitize_message(message: str) -> str:
     """Given a message, will discard all characters not being alphabetic."""
 
@@ -35,12 +50,20 @@ def write_cylinder_to_file(file: Filename, number_of_disks: int) -> None:
             f.write(generate_disk() + '\n')
 
 
-def load_cylinder_from_file(file: Filename) -> Cylinder:
+@instrumented('cylinder_load', lambda arguments, result: {
+    'cylinder_loads_total': 1,
+    'cylinder_disks_loaded_total': len(result),
+    'cylinder_bytes_loaded_total': getsize(arguments['file'])
+})
+def load_cylinder_from_file(file: Filename, validate: bool=False) -> Cylinder:
     """Read file line by line and return a dict composed of the content of each
-    line as values and their line number as keys.
+    line as values and their line number as keys. With validate, raise an
+    InvalidCylinderError if a disk is not a permutation of the alphabet.
     """
 
     with open(file, 'r') as f:
+        if validate:
+            return read_checked_cylinder(f, file)[0]
         raw_cylinder = f.read()
         return {
             i + 1: disk
@@ -49,6 +72,36 @@ def load_cylinder_from_file(file: Filename) -> Cylinder:
         }
 
 
+@instrumented('cylinder_load', lambda arguments, result: {
+    'cylinder_loads_total': 1,
+    'cylinder_disks_loaded_total': len(result[0]),
+    'cylinder_bytes_loaded_total': getsize(arguments['file'])
+})
+def load_and_check_cylinder(file: Filename) -> Tuple[Cylinder, CylinderCheck]:
+    """Read file line by line once, and return both its cylinder and its
+    check, which holds its fingerprint. Raise an InvalidCylinderError if a
+    disk is not a permutation of the alphabet.
+    """
+
+    with open(file, 'r') as f:
+        return read_checked_cylinder(f, file)
+
+
+def read_checked_cylinder(lines: Iterable[str],
+                          source: str) -> Tuple[Cylinder, CylinderCheck]:
+    """Build and check a cylinder from its lines in a single pass."""
+
+    cylinder = {}  # type: Cylinder
+    check = check_lines(lines, cylinder)
+    if check.problems:
+        raise InvalidCylinderError(source, check.problems)
+    return cylinder, check
+
+
+@instrumented('key_validation', lambda arguments, result: {
+    'key_validations_total': 1,
+    'key_validation_failures_total': 0 if result else 1
+})
 def is_key_valid(key: Key, n: int) -> bool:
     """Check if key is valid, i.e. key is a permutation of all numbers from 1
     to the number of disks (included) wanted.
@@ -94,6 +147,10 @@ def cipher_letter(letter: Letter, disk: Disk) -> Letter:
     return disk[jefferson_shift(find(letter, disk))]
 
 
+@instrumented('encrypt', lambda arguments, result: {
+    'encrypted_messages_total': 1,
+    'encrypted_letters_total': len(result)
+})
 def cipher_message(message: str, key: Key, cylinder: Cylinder) -> str:
     """Encrypt message with the Jefferson method using the key and the set of
     disks provided.
@@ -105,7 +162,7 @@ def cipher_message(message: str, key: Key, cylinder: Cylinder) -> str:
             for index, letter in enumerate(sanitize_message(message))
         ])
     else:
-        raise Exception("The key provided is not valid.")
+        raise InvalidKeyError("The key provided is not valid.")
 
 
 def revert_jefferson_shift(n: int) -> int:
@@ -120,6 +177,10 @@ def decipher_letter(letter: Letter, disk: Disk) -> Letter:
     return disk[revert_jefferson_shift(find(letter, disk))]
 
 
+@instrumented('decrypt', lambda arguments, result: {
+    'decrypted_messages_total': 1,
+    'decrypted_letters_total': len(result)
+})
 def decipher_message(message: str, key: Key, cylinder: Cylinder) -> str:
     """Decrypt message with the Jefferson method using the key and the set of
     disks provided.
@@ -131,4 +192,4 @@ def decipher_message(message: str, key: Key, cylinder: Cylinder) -> str:
             for index, letter in enumerate(message)
         ])
     else:
-        raise Exception("The key provided is not valid.")
+        raise InvalidKeyError("The key provided is not valid.")
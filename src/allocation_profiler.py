@@ -0,0 +1,456 @@
+"""Allocation profiling of the GUI frames and of the engine hot paths, based
+on tracemalloc.
+
+Each measured region (a frame, a call to cipher_message(), ...) is given a
+label. For every label the profiler accumulates:
+ * the memory left allocated by the region, attributed to source lines
+ * the memory allocated at the highest point of the region, attributed to
+   source lines: it includes the temporary allocations, freed before the
+   region ends, that the memory left allocated does not show
+ * the peak of memory allocated while in the region (outermost regions only)
+ * the garbage collections that happened in the region, and how long they
+   took
+
+Taking the lines at peak is slow, so it is only done in one outermost region
+out of peak_sampling (never by default), and in the regions nested in it.
+There, the traced memory is checked each time a function returns, while its
+locals are still alive, with sys.setprofile(): a snapshot is taken whenever
+it grew by PEAK_STEP_RATIO (and at least MINIMUM_PEAK_STEP bytes) since the
+previous one, so the highest point is known within that step. This is
+skipped when another profiler is already set. Garbage collections are
+disabled while the profiler takes snapshots, so they are not charged to the
+regions.
+
+The peak of memory is measured with tracemalloc.reset_peak(), new in Python
+3.9. On older versions, it is the highest memory seen at the checks of the
+sampled regions, and the memory at the end of the other ones.
+
+Profiles are saved as JSON. Running this file prints the top lines of a
+profile, or the difference between two profiles:
+
+    python3 src/allocation_profiler.py report profile.json
+    python3 src/allocation_profiler.py diff before.json after.json
+"""
+
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Tuple
+
+# Type aliases
+Filename = str
+LabelProfile = Dict[str, Any]
+Profile = Dict[str, LabelProfile]
+Region = Dict[str, Any]
+Lines = Dict[str, Tuple[int, int]]
+
+PROFILE_VERSION = 1
+# Modules run by the profiler itself while measuring, whose allocations are
+# not part of the regions
+PROFILER_MODULES = ('contextlib', 'fnmatch', 're', 'sre_compile', 'sre_parse',
+                    'tracemalloc')
+# The lines at peak are taken again once the memory allocated in the region
+# grew by this ratio, and at least by MINIMUM_PEAK_STEP bytes
+PEAK_STEP_RATIO = 0.125
+MINIMUM_PEAK_STEP = 4096
+HAS_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+# Lines of a label profile, the number of calls they add up, and how reports
+# title them
+LINE_KINDS = (('lines', 'calls', 'left allocated'),
+              ('peak_lines', 'peak_samples', 'allocated at peak'))
+
+
+class AllocationProfiler:
+    """Accumulate allocation statistics by label, see the module
+    documentation. start() must be called before measuring anything.
+    """
+
+    def __init__(self, traceback_depth: int=1, peak_sampling: int=0) -> None:
+        self.traceback_depth = traceback_depth
+        # Lines at peak are taken in one outermost region out of this many
+        self.peak_sampling = peak_sampling
+        self.profile = {}  # type: Profile
+        self._regions = []  # type: List[Region]
+        self._outermost_regions = 0
+        self._watching_peaks = False
+        # Peak of the outermost region before the last snapshot taken
+        self._peak = 0
+        self._gc_start = 0.0
+        self._filters = [tracemalloc.Filter(False, __file__)] + [
+            tracemalloc.Filter(False, pattern)
+            for pattern in module_patterns(PROFILER_MODULES)
+        ]
+
+    def start(self) -> None:
+        """Start tracing allocations and watching garbage collections."""
+
+        tracemalloc.start(self.traceback_depth)
+        gc.callbacks.append(self._on_gc)
+
+    def stop(self) -> None:
+        """Stop tracing allocations. The profile is kept."""
+
+        gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+    @contextmanager
+    def measure(self, label: str) -> Iterator[None]:
+        """Attribute the allocations made inside the with block to label."""
+
+        outermost = not self._regions
+        before = self._take_snapshot()
+        # Kept until the end of the region, so part of its start size
+        self._forget_snapshot()
+        start_size = tracemalloc.get_traced_memory()[0]
+        if outermost:
+            self._peak = 0
+            if (self.peak_sampling and
+                    self._outermost_regions % self.peak_sampling == 0):
+                self._start_watching_peaks()
+            self._outermost_regions += 1
+        region = {
+            'label': label,
+            'before': before,
+            'start_size': start_size,
+            'highest_size': start_size,
+            'sampled': self._watching_peaks,
+            'peak_lines': {}
+        }  # type: Region
+        self._regions.append(region)
+        try:
+            yield
+        finally:
+            if outermost:
+                self._stop_watching_peaks()
+            self._regions.pop()
+            end_size, peak = tracemalloc.get_traced_memory()
+            if HAS_RESET_PEAK:
+                peak = max(self._peak, peak)
+            else:
+                peak = max(region['highest_size'], end_size)
+            after = self._take_snapshot()
+            differences = after.compare_to(before, 'lineno')
+            del before, after
+            self._forget_snapshot()
+            if region['sampled'] and end_size >= region['highest_size']:
+                # The end of the region is its highest point seen
+                region['peak_lines'] = growth(differences)
+            self._accumulate(label, differences, region,
+                             peak - start_size if outermost else 0)
+
+    def measured(self, function: Callable, label: str) -> Callable:
+        """Return function, measured under label at each call."""
+
+        @wraps(function)
+        def measured_function(*args, **kwargs):
+            with self.measure(label):
+                return function(*args, **kwargs)
+
+        return measured_function
+
+    def instrument(self, owner: Any, name: str) -> None:
+        """Replace the function owner.<name> (owner being a module or a
+        class) by its measured version, labelled after its name.
+        """
+
+        setattr(owner, name, self.measured(getattr(owner, name), name))
+
+    def _start_watching_peaks(self) -> None:
+        """Check the memory allocated each time a function returns, unless
+        another profiler is set.
+        """
+
+        if sys.getprofile() is None:
+            sys.setprofile(self._on_profile_event)
+            self._watching_peaks = True
+
+    def _stop_watching_peaks(self) -> None:
+        """Stop checking the memory allocated at function returns."""
+
+        if self._watching_peaks:
+            sys.setprofile(None)
+            self._watching_peaks = False
+
+    def _on_profile_event(self, frame: Any, event: str, arg: Any) -> None:
+        """Take the lines at peak of the regions whose memory allocated grew
+        enough since they were last taken.
+        """
+
+        if event not in ('return', 'c_return'):
+            return
+        size = tracemalloc.get_traced_memory()[0]
+        rising = [
+            region for region in self._regions
+            if size >= region['highest_size'] + max(
+                MINIMUM_PEAK_STEP,
+                (region['highest_size'] - region['start_size']) *
+                PEAK_STEP_RATIO)
+        ]
+        if not rising:
+            return
+        snapshot = self._take_snapshot()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        for region in rising:
+            region['highest_size'] = size
+            region['peak_lines'] = growth(
+                snapshot.compare_to(region['before'], 'lineno'))
+        del snapshot
+        if gc_enabled:
+            gc.enable()
+        self._forget_snapshot()
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        """Return a snapshot of the traces of the measured code. Call
+        _forget_snapshot() once done with it, to leave it out of the peak.
+        """
+
+        if HAS_RESET_PEAK:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return tracemalloc.take_snapshot().filter_traces(self._filters)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _forget_snapshot(self) -> None:
+        """Start the peak again from the memory allocated now, after a
+        snapshot was taken.
+        """
+
+        if HAS_RESET_PEAK:
+            tracemalloc.reset_peak()
+
+    def _label_profile(self, label: str) -> LabelProfile:
+        """Return the profile of label, creating it if needed."""
+
+        if label not in self.profile:
+            self.profile[label] = {
+                'calls': 0,
+                'peak_bytes': 0,
+                'gc_collections': 0,
+                'gc_seconds': 0.0,
+                'lines': {},
+                'peak_samples': 0,
+                'peak_lines': {}
+            }
+        return self.profile[label]
+
+    def _accumulate(self, label: str, differences: List, region: Region,
+                    peak: int) -> None:
+        """Add the statistics of one measured region to the profile."""
+
+        label_profile = self._label_profile(label)
+        label_profile['calls'] += 1
+        label_profile['peak_bytes'] = max(label_profile['peak_bytes'], peak)
+        lines = label_profile['lines']
+        for difference in differences:
+            if difference.size_diff == 0 and difference.count_diff == 0:
+                continue
+            line = source_line(difference)
+            size, count = lines.get(line, (0, 0))
+            lines[line] = (size + difference.size_diff,
+                           count + difference.count_diff)
+        if not region['sampled']:
+            return
+        label_profile['peak_samples'] += 1
+        for line, (peak_size, peak_count) in region['peak_lines'].items():
+            size, count = label_profile['peak_lines'].get(line, (0, 0))
+            label_profile['peak_lines'][line] = (size + peak_size,
+                                                 count + peak_count)
+
+    def _on_gc(self, phase: str, info: Dict[str, int]) -> None:
+        """Charge garbage collections to the labels being measured."""
+
+        if phase == 'start':
+            self._gc_start = default_timer()
+            return
+        duration = default_timer() - self._gc_start
+        for label in set(region['label'] for region in self._regions):
+            label_profile = self._label_profile(label)
+            label_profile['gc_collections'] += 1
+            label_profile['gc_seconds'] += duration
+
+
+def module_patterns(names: Tuple[str, ...]) -> List[str]:
+    """Return the filename patterns of the source files of the given
+    modules, those imported.
+    """
+
+    patterns = []
+    for name in names:
+        file = getattr(sys.modules.get(name), '__file__', None)
+        if file is None:
+            continue
+        if hasattr(sys.modules[name], '__path__'):
+            # A package: all of its modules
+            patterns.append(os.path.join(os.path.dirname(file), '*'))
+        else:
+            patterns.append(file)
+    return patterns
+
+
+def source_line(difference: Any) -> str:
+    """Return the source line a tracemalloc statistic is about."""
+
+    frame = difference.traceback[0]
+    return '{}:{}'.format(frame.filename, frame.lineno)
+
+
+def growth(differences: List) -> Lines:
+    """Return the size and count of blocks added by each source line, out of
+    the differences between two snapshots.
+    """
+
+    return {
+        source_line(difference): (difference.size_diff,
+                                  difference.count_diff)
+        for difference in differences if difference.size_diff > 0
+    }
+
+
+def save_profile(profile: Profile, file: Filename) -> None:
+    """Write a profile to file as JSON."""
+
+    with open(file, 'w') as f:
+        json.dump({'version': PROFILE_VERSION, 'labels': profile}, f, indent=1)
+
+
+def load_profile(file: Filename) -> Profile:
+    """Read a profile written by save_profile()."""
+
+    with open(file, 'r') as f:
+        content = json.load(f)
+    if content.get('version') != PROFILE_VERSION:
+        raise ValueError("{} is not an allocation profile.".format(file))
+    return content['labels']
+
+
+def top_lines(lines: Mapping[str, Tuple[float, float]],
+              top: int) -> List[Tuple[str, float, float]]:
+    """Return the top source lines by allocated size, largest first."""
+
+    return sorted(
+        ((line, size, count) for line, (size, count) in lines.items()),
+        key=lambda line: abs(line[1]),
+        reverse=True)[:top]
+
+
+def profile_report(profile: Profile, top: int=10) -> str:
+    """Describe the profile: for each label its totals and top lines."""
+
+    report = []
+    for label, label_profile in sorted(profile.items()):
+        report.append(
+            '{}: {} calls, peak {} B, {} GC collections ({:.2f} ms)'.format(
+                label, label_profile['calls'], label_profile['peak_bytes'],
+                label_profile['gc_collections'],
+                label_profile['gc_seconds'] * 1000))
+        for kind, calls_kind, title in LINE_KINDS:
+            if not label_profile[kind]:
+                continue
+            calls = max(label_profile[calls_kind], 1)
+            report.append('  {}:'.format(title))
+            for line, size, count in top_lines(label_profile[kind], top):
+                report.append(
+                    '    {:>+12} B {:>+9} blocks ({:+.1f} B/call)  {}'.format(
+                        size, count, size / calls, line))
+    return '\n'.join(report)
+
+
+def diff_report(before: Profile, after: Profile, top: int=10) -> str:
+    """Describe how allocations changed from one profile to another, by
+    label and by source line, per call.
+    """
+
+    empty = {
+        'calls': 0,
+        'peak_bytes': 0,
+        'lines': {},
+        'peak_samples': 0,
+        'peak_lines': {}
+    }
+    report = []
+    for label in sorted(set(before) | set(after)):
+        old = before.get(label, empty)
+        new = after.get(label, empty)
+        report.append('{}: calls {} -> {}, peak {} B -> {} B'.format(
+            label, old['calls'], new['calls'], old['peak_bytes'],
+            new['peak_bytes']))
+
+        for kind, calls_kind, title in LINE_KINDS:
+            lines = {}  # type: Dict[str, Tuple[float, float]]
+            for line in set(old[kind]) | set(new[kind]):
+                old_size, old_count = per_call(old, kind, calls_kind, line)
+                new_size, new_count = per_call(new, kind, calls_kind, line)
+                if (new_size, new_count) != (old_size, old_count):
+                    lines[line] = (new_size - old_size, new_count - old_count)
+            if not lines:
+                continue
+            report.append('  {}:'.format(title))
+            for line, size, count in top_lines(lines, top):
+                report.append(
+                    '    {:>+12.1f} B/call {:>+9.1f} blocks/call  {}'.format(
+                        size, count, line))
+    return '\n'.join(report)
+
+
+def per_call(label_profile: LabelProfile, kind: str, calls_kind: str,
+             line: str) -> Tuple[float, float]:
+    """Return the size and count of blocks allocated by line per call, left
+    allocated or at peak depending on kind (see LINE_KINDS).
+    """
+
+    size, count = label_profile[kind].get(line, (0, 0))
+    calls = max(label_profile[calls_kind], 1)
+    return size / calls, count / calls
+
+
+def instrument_engine(profiler: AllocationProfiler) -> None:
+    """Measure the calls to the engine hot paths. Only the callers looking
+    them up through their module are affected.
+    """
+
+    import JeffersonShell
+    from component import rotate_disk
+
+    profiler.instrument(JeffersonShell, 'cipher_message')
+    profiler.instrument(JeffersonShell, 'load_cylinder_from_file')
+    profiler.instrument(rotate_disk, 'rotate_disk')
+
+
+def main() -> None:
+    """Print the report of a profile, or the diff between two."""
+
+    parser = ArgumentParser(description="Read allocation profiles.")
+    parser.add_argument('--top', type=int, default=10,
+                        help="number of source lines shown per label")
+    commands = parser.add_subparsers(dest='command')
+    report_command = commands.add_parser('report', help="report a profile")
+    report_command.add_argument('profile')
+    diff_command = commands.add_parser('diff', help="diff two profiles")
+    diff_command.add_argument('before')
+    diff_command.add_argument('after')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'report':
+        print(profile_report(load_profile(arguments.profile), arguments.top))
+    elif arguments.command == 'diff':
+        print(diff_report(
+            load_profile(arguments.before),
+            load_profile(arguments.after), arguments.top))
+    else:
+        parser.print_usage(sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Statistics over ciphertexts produced by cipher_message(), for cryptanalysis
+and audits: letter histograms per position (i.e. per disk of the key), bigram
+and quadgram counts, index of coincidence and chi-squared scores.
+
+Statistics accumulate over streams of messages of any size, can be merged
+when computed by parallel workers, and are persisted compactly to disk along
+with how far each audited file has been read, so that a later audit only
+reads the ciphertexts appended since.
+
+NumPy is optional; when installed, counting and scoring are vectorized.
+"""
+
+import json
+import sys
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from os import getpid, remove, replace
+from os.path import getsize, realpath
+from struct import Struct
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from JeffersonShell import sanitize_message
+from letter_arrays import HAS_NUMPY, ORD_A, flatten_messages
+
+if HAS_NUMPY:
+    import numpy
+
+# Type aliases
+Counts = array
+Filename = str
+
+BATCH_SIZE = 4096
+FILE_HEADER = Struct('<4sII')
+FILE_MAGIC = b'JSTA'
+FILE_VERSION = 1
+UNIFORM_FREQUENCIES = [1 / 26] * 26
+# Frequency of each letter, A to Z, in English texts
+ENGLISH_FREQUENCIES = [
+    0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015, 0.06094,
+    0.06966, 0.00153, 0.00772, 0.04025, 0.02406, 0.06749, 0.07507, 0.01929,
+    0.00095, 0.05987, 0.06327, 0.09056, 0.02758, 0.00978, 0.02360, 0.00150,
+    0.01974, 0.00074
+]
+
+
+class CiphertextStatistics:
+    """Counts accumulated over a corpus of ciphertexts. Every counts array is
+    a flat array of unsigned 64 bits integers:
+     * position_counts: 26 counts per position, position 0 first
+     * bigram_counts: 26 * 26 counts, indexed by 26 * first + second
+     * quadgram_counts: 26 ** 4 counts, indexed the same way
+    sources maps each audited file to the number of bytes read from it.
+    """
+
+    def __init__(self) -> None:
+        self.messages = 0
+        self.letters = 0
+        self.position_counts = array('Q')
+        self.bigram_counts = array('Q', bytes(8 * 26**2))
+        self.quadgram_counts = array('Q', bytes(8 * 26**4))
+        self.sources = {}  # type: Dict[Filename, int]
+
+    @property
+    def number_of_positions(self) -> int:
+        """Length of the longest message counted so far."""
+
+        return len(self.position_counts) // 26
+
+    def position_histogram(self, position: int) -> List[int]:
+        """Return the count of each letter at the given position."""
+
+        if position >= self.number_of_positions:
+            return [0] * 26
+        return self.position_counts[26 * position:26 * (position + 1)].tolist()
+
+    def add_messages(self, messages: Iterable[str]) -> None:
+        """Count the letters of every message. Messages are consumed by
+        batches, so any iterable, such as a generator over a huge corpus, can
+        be given.
+        """
+
+        batch = []  # type: List[str]
+        for message in messages:
+            batch.append(sanitize_message(message))
+            if len(batch) == BATCH_SIZE:
+                self._add_batch(batch)
+                batch = []
+        if batch:
+            self._add_batch(batch)
+
+    def add_message(self, message: str) -> None:
+        """Count the letters of a single message."""
+
+        self.add_messages([message])
+
+    def merge(self, other: 'CiphertextStatistics') -> None:
+        """Add the counts of other to these ones. For audited files, the
+        furthest read offset is kept; workers are expected to audit distinct
+        files.
+        """
+
+        self.messages += other.messages
+        self.letters += other.letters
+        self._grow_positions(other.number_of_positions)
+        add_counts(self.position_counts, other.position_counts)
+        add_counts(self.bigram_counts, other.bigram_counts)
+        add_counts(self.quadgram_counts, other.quadgram_counts)
+        for source, offset in other.sources.items():
+            self.sources[source] = max(offset, self.sources.get(source, 0))
+
+    def _grow_positions(self, number_of_positions: int) -> None:
+        """Make room for the counts of number_of_positions positions."""
+
+        missing = number_of_positions - self.number_of_positions
+        if missing > 0:
+            self.position_counts.extend(array('Q', bytes(8 * 26 * missing)))
+
+    def _add_batch(self, batch: List[str]) -> None:
+        """Count the letters of a batch of sanitized messages."""
+
+        self.messages += len(batch)
+        self.letters += sum(len(message) for message in batch)
+        self._grow_positions(max(len(message) for message in batch))
+        if HAS_NUMPY:
+            self._add_batch_vectorized(batch)
+            return
+
+        positions = self.position_counts
+        bigrams = self.bigram_counts
+        quadgrams = self.quadgram_counts
+        for message in batch:
+            codes = [ord(letter) - ORD_A for letter in message]
+            for position, code in enumerate(codes):
+                positions[26 * position + code] += 1
+            for i in range(len(codes) - 1):
+                bigrams[26 * codes[i] + codes[i + 1]] += 1
+            for i in range(len(codes) - 3):
+                quadgrams[((codes[i] * 26 + codes[i + 1]) * 26 + codes[i + 2])
+                          * 26 + codes[i + 3]] += 1
+
+    def _add_batch_vectorized(self, batch: List[str]) -> None:
+        """Same as _add_batch(), with NumPy."""
+
+        codes, positions, lengths = flatten_messages(batch)
+        if not len(codes):
+            return
+
+        add_counts(self.position_counts,
+                   numpy.bincount(26 * positions + codes,
+                                  minlength=len(self.position_counts)))
+
+        # A n-gram is counted where its last letter is at least the nth one
+        # of its message, i.e. where it does not span two messages
+        bigrams = 26 * codes[:-1] + codes[1:]
+        add_counts(self.bigram_counts,
+                   numpy.bincount(bigrams[positions[1:] >= 1],
+                                  minlength=26**2))
+        quadgrams = (26 * bigrams[:-2] + codes[2:-1]) * 26 + codes[3:]
+        add_counts(self.quadgram_counts,
+                   numpy.bincount(quadgrams[positions[3:] >= 3],
+                                  minlength=26**4))
+
+
+def add_counts(counts: Counts, other) -> None:
+    """Add other, a sequence of counts of the same length or shorter, to the
+    counts in place.
+    """
+
+    if HAS_NUMPY:
+        view = numpy.frombuffer(counts, numpy.uint64)
+        view[:len(other)] += numpy.asarray(other, numpy.uint64)
+        del view  # Release the buffer so counts can be resized again
+        return
+
+    for index, count in enumerate(other):
+        counts[index] += count
+
+
+def index_of_coincidence(counts: Iterable[int]) -> float:
+    """Return the probability that two letters drawn from the counted ones
+    are the same.
+    """
+
+    counts = list(counts)
+    total = sum(counts)
+    if total < 2:
+        return 0.0
+    return sum(n * (n - 1) for n in counts) / (total * (total - 1))
+
+
+def chi_squared(counts: Iterable[int],
+                frequencies: List[float]=UNIFORM_FREQUENCIES) -> float:
+    """Return the chi-squared statistic of the counts against the expected
+    frequencies, uniform by default.
+    """
+
+    counts = list(counts)
+    total = sum(counts)
+    return sum((count - total * frequency)**2 / (total * frequency)
+               for count, frequency in zip(counts, frequencies)
+               if frequency > 0 and total > 0)
+
+
+def position_scores(
+        statistics: CiphertextStatistics,
+        frequencies: List[float]=UNIFORM_FREQUENCIES
+) -> Tuple[List[float], List[float]]:
+    """Return the index of coincidence and the chi-squared statistic of every
+    position, computed all at once.
+    """
+
+    if not HAS_NUMPY:
+        histograms = [
+            statistics.position_histogram(position)
+            for position in range(statistics.number_of_positions)
+        ]
+        return ([index_of_coincidence(h) for h in histograms],
+                [chi_squared(h, frequencies) for h in histograms])
+
+    counts = numpy.frombuffer(statistics.position_counts,
+                              numpy.uint64).reshape(-1, 26).astype(float)
+    totals = counts.sum(axis=1)
+    pairs = totals * (totals - 1)
+    coincidences = numpy.divide((counts * (counts - 1)).sum(axis=1), pairs,
+                                out=numpy.zeros_like(totals),
+                                where=pairs > 0)
+    expected = numpy.outer(totals, numpy.asarray(frequencies, float))
+    deviations = numpy.divide((counts - expected)**2, expected,
+                              out=numpy.zeros_like(counts),
+                              where=expected > 0)
+    return coincidences.tolist(), deviations.sum(axis=1).tolist()
+
+
+def read_new_lines(file: Filename, offset: int) -> Iterator[Tuple[str, int]]:
+    """Yield every complete line of file after the given byte offset, along
+    with the offset right after it.
+    """
+
+    if getsize(file) < offset:
+        raise ValueError("{} is shorter than when it was last audited.".format(
+            file))
+    with open(file, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Still being written, it will be read next time
+            offset += len(line)
+            yield line.decode('ascii', 'ignore'), offset
+
+
+def update_from_file(statistics: CiphertextStatistics, file: Filename) -> None:
+    """Count the ciphertexts, one per line, appended to file since it was
+    last audited into these statistics.
+    """
+
+    source = realpath(file)
+    read_up_to = statistics.sources.get(source, 0)
+
+    def messages() -> Iterator[str]:
+        nonlocal read_up_to
+        for line, offset in read_new_lines(source, read_up_to):
+            read_up_to = offset
+            yield line
+
+    statistics.add_messages(messages())
+    statistics.sources[source] = read_up_to
+
+
+def statistics_from_file(file: Filename, offset: int) -> CiphertextStatistics:
+    """Return the statistics of the ciphertexts of file after offset."""
+
+    statistics = CiphertextStatistics()
+    statistics.sources[realpath(file)] = offset
+    update_from_file(statistics, file)
+    return statistics
+
+
+def update_from_files(statistics: CiphertextStatistics,
+                      files: List[Filename],
+                      workers: int=1) -> None:
+    """Audit the new ciphertexts of every file, one file per worker process,
+    and merge the results into statistics.
+    """
+
+    offsets = [statistics.sources.get(realpath(file), 0) for file in files]
+    if workers <= 1:
+        partials = map(statistics_from_file, files, offsets)
+        for partial in partials:
+            statistics.merge(partial)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        for partial in executor.map(statistics_from_file, files, offsets):
+            statistics.merge(partial)
+
+
+def save_statistics(statistics: CiphertextStatistics, file: Filename) -> None:
+    """Write statistics to file: a small JSON header followed by the counts,
+    compressed.
+    """
+
+    header = json.dumps({
+        'messages': statistics.messages,
+        'letters': statistics.letters,
+        'positions': statistics.number_of_positions,
+        'sources': statistics.sources
+    }).encode('utf-8')
+    compressor = zlib.compressobj()
+    temporary_file = '{}.{}.tmp'.format(file, getpid())
+    try:
+        with open(temporary_file, 'wb') as f:
+            f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(header)))
+            f.write(header)
+            for counts in (statistics.position_counts,
+                           statistics.bigram_counts,
+                           statistics.quadgram_counts):
+                f.write(compressor.compress(little_endian(counts).tobytes()))
+            f.write(compressor.flush())
+        # Atomically, an interrupted save leaves the previous statistics whole
+        replace(temporary_file, file)
+    except BaseException:
+        try:
+            remove(temporary_file)
+        except OSError:
+            pass
+        raise
+
+
+def load_statistics(file: Filename) -> CiphertextStatistics:
+    """Read statistics previously written by save_statistics()."""
+
+    with open(file, 'rb') as f:
+        magic, version, header_size = FILE_HEADER.unpack(
+            f.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError("{} does not hold ciphertext statistics.".format(
+                file))
+        header = json.loads(f.read(header_size).decode('utf-8'))
+        raw_counts = array('Q', zlib.decompress(f.read()))
+    if sys.byteorder == 'big':
+        raw_counts.byteswap()
+
+    statistics = CiphertextStatistics()
+    statistics.messages = header['messages']
+    statistics.letters = header['letters']
+    statistics.sources = header['sources']
+    bigrams_start = 26 * header['positions']
+    quadgrams_start = bigrams_start + 26**2
+    statistics.position_counts = raw_counts[:bigrams_start]
+    statistics.bigram_counts = raw_counts[bigrams_start:quadgrams_start]
+    statistics.quadgram_counts = raw_counts[quadgrams_start:]
+    if len(statistics.quadgram_counts) != 26**4:
+        raise ValueError("{} is truncated.".format(file))
+    return statistics
+
+
+def little_endian(counts: Counts) -> Counts:
+    """Return counts in little endian byte order, the one used on disk."""
+
+    if sys.byteorder == 'big':
+        counts = array('Q', counts)
+        counts.byteswap()
+    return counts
@@ -0,0 +1,51 @@
+"""Functions and procedures used to draw and interact with the 'Copy to file'
+button.
+"""
+
+from functools import partial
+from typing import Any, Dict
+
+from component.message_preview import write_ciphered_message_to_file
+from component.write_text import write_centered_text
+from gui_parameters import (BUTTON_BG_COLOR, BUTTON_FG_COLOR,
+                            BUTTON_FONT_SIZE)
+
+# Type aliases
+ButtonData = Dict[str, Any]
+PreviewData = Dict[str, Any]
+
+
+def generate_copy_button_data(preview_data: PreviewData,
+                              window) -> ButtonData:
+    """Compute the copy button data, for a button right above the exit
+    button. Unlike the latter, clicking on it writes the ciphered message
+    without closing the window. See generate_rotation_button_data() for more
+    insight on what button data is.
+    """
+
+    button_dimensions = (window.get_width() / 10, window.get_height() / 20)
+    button_pos = (window.get_width() - button_dimensions[0],
+                  window.get_height() / 10 * 9 - button_dimensions[1])
+    button_surface = window.subsurface(button_pos, button_dimensions)
+
+    return {
+        'type': 'copy',
+        'surface': button_surface,
+        'onclick': partial(write_ciphered_message_to_file, preview_data,
+                           'encrypted-message.txt'),
+        'drawable': True,
+        'clickable': True
+    }
+
+
+def draw_copy_button(button_data: ButtonData) -> None:
+    """Draw the copy button using its button data."""
+
+    if button_data['drawable']:
+        button_surface = button_data['surface']
+        button_surface.fill(BUTTON_BG_COLOR)
+        write_centered_text(
+            'Copy to file',
+            button_surface,
+            font_size=BUTTON_FONT_SIZE,
+            font_color=BUTTON_FG_COLOR)
@@ -1,14 +1,30 @@
-"""Procedures to draw a cylinder onto the screen."""
+"""Procedures to draw a cylinder onto the screen.
 
-from typing import Dict, List
+Each disk is rendered once into a strip, a surface as tall as two disks
+holding its letters twice in a row. Any rotation of the disk is then a window
+of 26 letters onto that strip, so drawing a disk is a single blit. It also
+lets a rotation be animated, by sliding the window a bit every frame.
+"""
+
+from typing import Dict, List, Tuple
+
+import pygame
 
 from component.write_text import write_centered_text
+from gui_parameters import DISK_ROTATION_EASING
 
 # Type aliases
 Disk = str
 Cylinder = Dict[int, Disk]
 Letter = str
 Key = List[int]
+Dimensions = Tuple[float, float]
+
+# Rendered strips by disk number: the disk as rendered, the dimensions of the
+# disk on screen and the strip itself
+DISK_STRIPS = {}  # type: Dict[int, Tuple[Disk, Dimensions, pygame.Surface]]
+# Offset, in letters, of the window currently shown onto each strip
+SHOWN_OFFSETS = {}  # type: Dict[int, float]
 
 
 def draw_cylinder(cylinder: Cylinder, key: Key, window) -> None:
@@ -31,16 +47,69 @@ def draw_disk(cylinder: Cylinder,
               location: int,
               cylinder_surface) -> None:
     """Draw a disk at the given location where it should be drawn onto the
-    cylinder_surface.
+    cylinder_surface, by blitting the window of its strip matching its
+    current rotation.
     """
 
     disk_dimensions = (cylinder_surface.get_width() / len(cylinder),
                        cylinder_surface.get_height())
     disk_pos = (disk_dimensions[0] * location, 0)
-    disk_surface = cylinder_surface.subsurface(disk_pos, disk_dimensions)
 
-    for letter_number, letter in enumerate(cylinder[disk_number]):
-        draw_letter(letter, letter_number, disk_surface)
+    strip, offset = get_disk_strip(disk_number, cylinder[disk_number],
+                                   disk_dimensions)
+    disk_height = strip.get_height() // 2
+    window_top = round(ease_offset(disk_number, offset) * disk_height / 26)
+    cylinder_surface.blit(strip, disk_pos,
+                          pygame.Rect(0, window_top, strip.get_width(),
+                                      disk_height))
+
+
+def get_disk_strip(disk_number: int, disk: Disk,
+                   disk_dimensions: Dimensions) -> Tuple[pygame.Surface, int]:
+    """Return the strip of the disk along with the offset of its current
+    rotation onto it. The strip is only rendered again if the disk changed
+    other than by rotating, or if its dimensions changed.
+    """
+
+    if disk_number in DISK_STRIPS:
+        strip_disk, strip_dimensions, strip = DISK_STRIPS[disk_number]
+        offset = (strip_disk * 2).find(disk)
+        if offset != -1 and strip_dimensions == disk_dimensions:
+            return strip, offset
+
+    strip = render_disk_strip(disk, disk_dimensions)
+    DISK_STRIPS[disk_number] = (disk, disk_dimensions, strip)
+    SHOWN_OFFSETS[disk_number] = 0
+    return strip, 0
+
+
+def render_disk_strip(disk: Disk, disk_dimensions: Dimensions):
+    """Render the letters of the disk twice in a row onto a new surface."""
+
+    disk_width = round(disk_dimensions[0])
+    disk_height = round(disk_dimensions[1])
+    strip = pygame.Surface((disk_width, disk_height * 2))
+    for copy in range(2):
+        disk_surface = strip.subsurface((0, disk_height * copy),
+                                        (disk_width, disk_height))
+        for letter_number, letter in enumerate(disk):
+            draw_letter(letter, letter_number, disk_surface)
+    return strip
+
+
+def ease_offset(disk_number: int, offset: int) -> float:
+    """Move the shown offset of the disk part of the way to the given one,
+    the shortest way around, and return it.
+    """
+
+    shown_offset = SHOWN_OFFSETS.get(disk_number, offset)
+    distance = (offset - shown_offset + 13) % 26 - 13
+    if abs(distance) < 0.05:
+        shown_offset = offset
+    else:
+        shown_offset = (shown_offset + distance * DISK_ROTATION_EASING) % 26
+    SHOWN_OFFSETS[disk_number] = shown_offset
+    return shown_offset
 
 
 def draw_letter(letter: Letter, letter_number: int, disk_surface) -> None:
@@ -6,7 +6,8 @@ from functools import partial
 from typing import Any, Dict, List
 
 from component.write_text import write_centered_text
-from gui_parameters import BUTTON_BG_COLOR, BUTTON_FG_COLOR
+from gui_parameters import (BUTTON_BG_COLOR, BUTTON_FG_COLOR,
+                            BUTTON_FONT_SIZE)
 
 # Type aliases
 ButtonData = Dict[str, Any]
@@ -47,7 +48,7 @@ def draw_exit_button(button_data: ButtonData) -> None:
         write_centered_text(
             'Save and exit',
             button_surface,
-            font_size=26,
+            font_size=BUTTON_FONT_SIZE,
             font_color=BUTTON_FG_COLOR)
 
 
@@ -0,0 +1,234 @@
+"""Functions and procedures used to draw the message preview, a panel at the
+top of the sidebar showing as text the messages currently on the '< CLEAR'
+and '< CIPHERED' lines.
+
+The panel is drawn once onto its own surface, then kept up to date as disks
+rotate: a rotation only changes the letter of one disk in each message, so
+only those two letters are updated and drawn again, from rendered letters
+kept in a cache. Drawing the panel is then a single blit per frame.
+
+When the messages do not fit even at MINIMUM_FONT_SIZE, the panel shows as
+many letters as it can, starting at location 'first'. A cell holding
+OVERFLOW_MARKER stands where letters are hidden before or after, and the
+panel scrolls to the letters of a disk rotated out of view.
+"""
+
+from string import ascii_uppercase
+from typing import Any, Dict, List, Tuple
+
+import pygame
+
+from component.write_text import get_font
+from gui_parameters import FONT_COLOR, PREVIEW_FONT_SIZE
+
+# Type aliases
+PreviewData = Dict[str, Any]
+Disk = str
+Cylinder = Dict[int, Disk]
+Dimensions = Tuple[float, float]
+Filename = str
+Key = List[int]
+Letter = str
+
+BLACK = (0, 0, 0)
+# Name, title and line on the disks of the messages shown
+MESSAGES = (('clear', 'Clear', 9), ('ciphered', 'Ciphered', 15))
+MINIMUM_FONT_SIZE = 8
+# Shown instead of the first or last letter of the panel when there are
+# more letters hidden before or after
+OVERFLOW_MARKER = '+'
+
+# Rendered letters by font size and letter
+GLYPHS = {}  # type: Dict[Tuple[int, Letter], pygame.Surface]
+
+
+def generate_message_preview_data(cylinder: Cylinder, key: Key,
+                                  window) -> PreviewData:
+    """Compute the message preview data: the messages, where each disk's
+    letter is shown, and the surface of the panel, drawn once here.
+    """
+
+    panel_dimensions = (window.get_width() / 10,
+                        window.get_height() / 10 * 9 / 26 * MESSAGES[0][2])
+    panel_pos = (window.get_width() - panel_dimensions[0], 0)
+    font_size, cell_dimensions, columns, rows = fit_letters(
+        len(key), panel_dimensions)
+
+    preview_data = {
+        'type': 'message_preview',
+        'surface': pygame.Surface((round(panel_dimensions[0]),
+                                   round(panel_dimensions[1]))),
+        'pos': panel_pos,
+        'font_size': font_size,
+        'cell_dimensions': cell_dimensions,
+        'columns': columns,
+        # Letters shown per message, from location 'first'
+        'capacity': columns * rows,
+        'first': 0,
+        'locations': {
+            disk_number: location
+            for location, disk_number in enumerate(key)
+        },
+        'drawable': True,
+        'clickable': False
+    }
+    for name, _, line in MESSAGES:
+        preview_data[name] = [
+            cylinder[disk_number][line] for disk_number in key
+        ]
+    render_message_preview(preview_data)
+    return preview_data
+
+
+def fit_letters(
+        number_of_letters: int,
+        panel_dimensions: Dimensions) -> Tuple[int, Dimensions, int, int]:
+    """Return the largest font size, down to MINIMUM_FONT_SIZE, at which each
+    message fits into its half of the panel, below its title. Along with it,
+    the dimensions of the cell of a letter and the number of letters per row
+    and of rows.
+    """
+
+    for font_size in range(PREVIEW_FONT_SIZE, MINIMUM_FONT_SIZE - 1, -1):
+        font = get_font(font_size)
+        cell_dimensions = (max(font.size(letter)[0]
+                               for letter in ascii_uppercase),
+                           font.get_linesize())
+        columns = max(int(panel_dimensions[0] // cell_dimensions[0]), 1)
+        rows = max(int(panel_dimensions[1] / len(MESSAGES) //
+                       cell_dimensions[1]) - 1, 1)
+        if columns * rows >= number_of_letters:
+            break
+    return font_size, cell_dimensions, columns, rows
+
+
+def render_message_preview(preview_data: PreviewData) -> None:
+    """Draw the whole panel: the titles, the letters of the messages shown
+    and the overflow markers.
+    """
+
+    surface = preview_data['surface']
+    surface.fill(BLACK)
+    font = get_font(preview_data['font_size'])
+    first = preview_data['first']
+    last_cell = preview_data['capacity'] - 1
+    for message_index, (name, title, _) in enumerate(MESSAGES):
+        title_surface = font.render(title, True, FONT_COLOR)
+        surface.blit(title_surface, (0, section_top(preview_data,
+                                                    message_index)))
+        for location in range(first, min(first + last_cell + 1,
+                                         len(preview_data[name]))):
+            render_letter(preview_data, message_index, location)
+        if first > 0:
+            render_cell(preview_data, message_index, 0, OVERFLOW_MARKER)
+        if first + last_cell + 1 < len(preview_data[name]):
+            render_cell(preview_data, message_index, last_cell,
+                        OVERFLOW_MARKER)
+
+
+def render_letter(preview_data: PreviewData, message_index: int,
+                  location: int) -> None:
+    """Draw again the letter of the disk at location in a message, if it is
+    shown.
+    """
+
+    if is_shown(preview_data, location):
+        render_cell(preview_data, message_index,
+                    location - preview_data['first'],
+                    preview_data[MESSAGES[message_index][0]][location])
+
+
+def render_cell(preview_data: PreviewData, message_index: int, cell_index: int,
+                letter: Letter) -> None:
+    """Draw a letter into a cell of the section of a message, the cells
+    being numbered from the top left one.
+    """
+
+    cell_width, cell_height = preview_data['cell_dimensions']
+    row, column = divmod(cell_index, preview_data['columns'])
+    cell = pygame.Rect(
+        round(column * cell_width),
+        round(section_top(preview_data, message_index) + (row + 1) *
+              cell_height), round(cell_width), round(cell_height))
+
+    glyph = get_glyph(preview_data['font_size'], letter)
+    surface = preview_data['surface']
+    surface.fill(BLACK, cell)
+    surface.blit(glyph, glyph.get_rect(center=cell.center))
+
+
+def is_shown(preview_data: PreviewData, location: int) -> bool:
+    """Check if the letters at location are shown, rather than scrolled out
+    of the panel or hidden by an overflow marker.
+    """
+
+    cell_index = location - preview_data['first']
+    last_cell = preview_data['capacity'] - 1
+    if not 0 <= cell_index <= last_cell:
+        return False
+    if cell_index == 0 and preview_data['first'] > 0:
+        return False
+    return (cell_index < last_cell or
+            location == len(preview_data[MESSAGES[0][0]]) - 1)
+
+
+def scroll_to(preview_data: PreviewData, location: int) -> None:
+    """Scroll the panel to show the letters at location in the middle."""
+
+    preview_data['first'] = max(
+        min(location - preview_data['capacity'] // 2,
+            len(preview_data[MESSAGES[0][0]]) - preview_data['capacity']), 0)
+
+
+def section_top(preview_data: PreviewData, message_index: int) -> float:
+    """Return where the section of a message starts in the panel."""
+
+    return (preview_data['surface'].get_height() / len(MESSAGES) *
+            message_index)
+
+
+def get_glyph(font_size: int, letter: Letter) -> pygame.Surface:
+    """Return the letter rendered at the given size, rendering it only the
+    first time.
+    """
+
+    if (font_size, letter) not in GLYPHS:
+        GLYPHS[font_size, letter] = get_font(font_size).render(letter, True,
+                                                               FONT_COLOR)
+    return GLYPHS[font_size, letter]
+
+
+def update_message_preview(preview_data: PreviewData, cylinder: Cylinder,
+                           disk_number: int) -> None:
+    """Update the messages after the given disk rotated. Only its letters
+    are looked at and drawn again, unless the panel has to scroll to them.
+    """
+
+    location = preview_data['locations'][disk_number]
+    disk = cylinder[disk_number]
+    shown = is_shown(preview_data, location)
+    for message_index, (name, _, line) in enumerate(MESSAGES):
+        if preview_data[name][location] != disk[line]:
+            preview_data[name][location] = disk[line]
+            if shown:
+                render_letter(preview_data, message_index, location)
+    if not shown:
+        scroll_to(preview_data, location)
+        render_message_preview(preview_data)
+
+
+def draw_message_preview(preview_data: PreviewData, window) -> None:
+    """Draw the message preview panel onto the window."""
+
+    if preview_data['drawable']:
+        window.blit(preview_data['surface'], preview_data['pos'])
+
+
+def write_ciphered_message_to_file(preview_data: PreviewData,
+                                   file: Filename) -> None:
+    """Write the ciphered message currently shown into a file with the given
+    filename.
+    """
+
+    with open(file, 'w') as f:
+        f.write(''.join(preview_data['ciphered']))
@@ -49,6 +49,7 @@ def generate_rotation_button_data(cylinder: Cylinder,
 
     return {
         'type': 'rotation',
+        'disk_number': disk_number,
         'does_rotate_up': does_rotate_up,
         'surface': button_surface,
         'onclick': partial(rotate_disk_from_cylinder_in_place, cylinder,
@@ -1,13 +1,22 @@
 """Functions and procedures used to draw/write text onto the screen."""
 
-from typing import Tuple
+from os.path import isfile
+from typing import Dict, Optional, Tuple
 
 import pygame
 
 from gui_parameters import FONT_COLOR, FONT_NAME, FONT_SIZE
+from user_cache import cache_file
 
 # Type aliases
 Color = Tuple[int, int, int]
+Filename = str
+
+# Path to FONT_NAME, resolved once (None stands for pygame's default font)
+FONT_PATH = None  # type: Optional[Filename]
+FONT_PATH_RESOLVED = False
+# Fonts already loaded, by size
+FONTS = {}  # type: Dict[int, pygame.font.Font]
 
 
 def write_centered_text(text: str,
@@ -16,8 +25,7 @@ def write_centered_text(text: str,
                         font_color: Color=FONT_COLOR) -> None:
     """Draw text centered onto the parent surface given."""
 
-    font = pygame.font.Font(pygame.font.match_font(FONT_NAME), font_size)
-    text_surface = font.render(text, True, font_color)
+    text_surface = get_font(font_size).render(text, True, font_color)
     text_pos = text_surface.get_rect(center=(
         0.5 * parent_surface.get_width(), 0.5 * parent_surface.get_height()))
     parent_surface.blit(text_surface, text_pos)
@@ -29,9 +37,57 @@ def write_left_aligned_text(text: str,
                             font_color: Color=FONT_COLOR) -> None:
     """Draw the given text at the left border of the parent surface."""
 
-    font = pygame.font.Font(pygame.font.match_font(FONT_NAME), font_size)
-    text_surface = font.render(text, True, font_color)
+    text_surface = get_font(font_size).render(text, True, font_color)
     text_pos = text_surface.get_rect(center=(
         0.5 * parent_surface.get_width(), 0.5 * parent_surface.get_height()))
     text_pos.left = 0  # Align text with left border
     parent_surface.blit(text_surface, text_pos)
+
+
+def get_font(font_size: int) -> pygame.font.Font:
+    """Return the GUI font at the given size, loading it only the first
+    time.
+    """
+
+    if font_size not in FONTS:
+        FONTS[font_size] = pygame.font.Font(resolve_font_path(), font_size)
+    return FONTS[font_size]
+
+
+def resolve_font_path() -> Optional[Filename]:
+    """Return the path to FONT_NAME. Matching a font name can be slow (it
+    goes through fontconfig on Linux), so the match is kept in an on-disk
+    cache, and only done again once the cached path no longer exists.
+    """
+
+    global FONT_PATH
+    global FONT_PATH_RESOLVED
+
+    if FONT_PATH_RESOLVED:
+        return FONT_PATH
+
+    try:
+        file = cache_file('font-path.txt')
+    except OSError:
+        # No cache directory, the font is just matched at every start
+        FONT_PATH = pygame.font.match_font(FONT_NAME)
+        FONT_PATH_RESOLVED = True
+        return FONT_PATH
+    try:
+        with open(file, 'r') as f:
+            cached_name, cached_path = f.read().split('\n')[:2]
+    except (OSError, ValueError):
+        cached_name, cached_path = None, None
+
+    if cached_name == FONT_NAME and (cached_path == '' or
+                                     isfile(cached_path)):
+        FONT_PATH = cached_path or None
+    else:
+        FONT_PATH = pygame.font.match_font(FONT_NAME)
+        try:
+            with open(file, 'w') as f:
+                f.write(FONT_NAME + '\n' + (FONT_PATH or '') + '\n')
+        except OSError:
+            pass  # It will just be matched again next time
+    FONT_PATH_RESOLVED = True
+    return FONT_PATH
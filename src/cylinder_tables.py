@@ -0,0 +1,307 @@
+"""Prepared cylinder tables, i.e. the disk matrix of a cylinder along with its
+inverse-position tables (where each letter sits on each disk), laid out in a
+single flat buffer.
+
+That buffer can either live in the current process (prepare_cylinder()) or be
+published once into shared memory (publish_cylinder()) so that worker
+processes can attach to it by name, without copying, with attach_cylinder().
+
+Layout of the buffer:
+ * header: magic bytes b'JCYL' followed by the number of disks (uint32, LE)
+ * disks: 26 ASCII letters per disk, disk 1 first
+ * positions: 26 bytes per disk, the index of each letter of the alphabet on
+   the disk, or 255 when the letter is missing from it
+"""
+
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from string import ascii_uppercase
+from struct import Struct
+from threading import Lock, local
+from typing import Dict, Iterable, List, Optional
+
+from engine_metrics import instrumented
+from JeffersonShell import InvalidKeyError, is_key_valid, sanitize_message
+
+# Type aliases
+Disk = str
+Cylinder = Dict[int, Disk]
+Key = List[int]
+Letter = str
+
+HEADER = Struct('<4sI')
+MAGIC = b'JCYL'
+MISSING = 255
+ORD_A = ord('A')
+
+# Whether the current thread is opening an untracked segment, and the
+# original resource_tracker.register, see open_untracked_shared_memory()
+UNTRACKED = local()
+TRACKER_LOCK = Lock()
+TRACKER_REGISTER = None
+
+
+class CylinderTables:
+    """Read-only view over a prepared cylinder buffer. When backed by shared
+    memory, close() must be called once done with it, and the process that
+    published the cylinder is the one in charge of calling unlink().
+    """
+
+    def __init__(self, buffer,
+                 shared_memory: Optional[SharedMemory]=None,
+                 owner: bool=False) -> None:
+        self._shared_memory = shared_memory
+        self._owner = owner
+        self._buffer = memoryview(buffer)
+        magic, number_of_disks = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            self._buffer.release()
+            raise ValueError("The buffer does not hold cylinder tables.")
+        self.number_of_disks = number_of_disks
+        disks_start = HEADER.size
+        positions_start = disks_start + 26 * number_of_disks
+        self.disks = self._buffer[disks_start:positions_start]
+        self.positions = self._buffer[positions_start:positions_start +
+                                      26 * number_of_disks]
+
+    @property
+    def name(self) -> Optional[str]:
+        """Name of the shared memory segment, None if not shared."""
+
+        if self._shared_memory is None:
+            return None
+        return self._shared_memory.name
+
+    def disk(self, disk_number: int) -> Disk:
+        """Return the <disk_number>th disk as a string."""
+
+        offset = self._row(disk_number)
+        return bytes(self.disks[offset:offset + 26]).decode('ascii')
+
+    def position(self, disk_number: int, letter: Letter) -> int:
+        """Return the index of letter on the <disk_number>th disk, or -1 if
+        the letter is not on it. Same result as find() on the disk.
+        """
+
+        letter_index = ord(letter) - ORD_A
+        if not 0 <= letter_index < 26:
+            return -1
+        position = self.positions[self._row(disk_number) + letter_index]
+        return -1 if position == MISSING else position
+
+    def to_cylinder(self, disk_numbers: Optional[Iterable[int]]=None
+                    ) -> Cylinder:
+        """Rebuild the cylinder dict these tables were prepared from, or only
+        the part of it holding the given disks.
+        """
+
+        if disk_numbers is None:
+            disk_numbers = range(1, self.number_of_disks + 1)
+        return {
+            disk_number: self.disk(disk_number)
+            for disk_number in disk_numbers
+        }
+
+    def close(self) -> None:
+        """Release the buffer, and detach from the shared memory segment if
+        any. The tables can no longer be used afterwards.
+        """
+
+        self.disks.release()
+        self.positions.release()
+        self._buffer.release()
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory segment. Workers still attached to it
+        keep their mapping until they close it.
+        """
+
+        if self._shared_memory is not None:
+            self._shared_memory.unlink()
+
+    def __enter__(self) -> 'CylinderTables':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+        if self._owner:
+            self.unlink()
+
+    def _row(self, disk_number: int) -> int:
+        """Return the offset of the <disk_number>th disk inside the disks and
+        positions tables.
+        """
+
+        if not 1 <= disk_number <= self.number_of_disks:
+            raise KeyError(disk_number)
+        return 26 * (disk_number - 1)
+
+
+def tables_size(number_of_disks: int) -> int:
+    """Return the size in bytes of the tables of a cylinder."""
+
+    return HEADER.size + 2 * 26 * number_of_disks
+
+
+def write_tables(cylinder: Cylinder, buffer) -> None:
+    """Fill buffer with the tables of the given cylinder. Its disks must be
+    numbered from 1 to the number of disks and made of 26 uppercase letters.
+    """
+
+    number_of_disks = len(cylinder)
+    if sorted(cylinder) != list(range(1, number_of_disks + 1)):
+        raise ValueError("Disks must be numbered from 1 to {}.".format(
+            number_of_disks))
+
+    HEADER.pack_into(buffer, 0, MAGIC, number_of_disks)
+    disks_start = HEADER.size
+    positions_start = disks_start + 26 * number_of_disks
+    for disk_number in range(1, number_of_disks + 1):
+        disk = cylinder[disk_number]
+        if len(disk) != 26 or any(letter not in ascii_uppercase
+                                  for letter in disk):
+            raise ValueError(
+                "Disk {} is not made of 26 uppercase letters.".format(
+                    disk_number))
+
+        row = 26 * (disk_number - 1)
+        buffer[disks_start + row:disks_start + row + 26] = disk.encode('ascii')
+        positions = bytearray([MISSING] * 26)
+        # Walk backward so the first occurence wins, like find() does
+        for index in range(25, -1, -1):
+            positions[ord(disk[index]) - ORD_A] = index
+        buffer[positions_start + row:positions_start + row + 26] = positions
+
+
+def prepare_cylinder(cylinder: Cylinder) -> CylinderTables:
+    """Return the tables of cylinder, held by the current process."""
+
+    buffer = bytearray(tables_size(len(cylinder)))
+    write_tables(cylinder, buffer)
+    return CylinderTables(buffer)
+
+
+def publish_cylinder(cylinder: Cylinder,
+                     name: Optional[str]=None) -> CylinderTables:
+    """Write the tables of cylinder into a new shared memory segment and
+    return them. The segment's name, to give to attach_cylinder(), is
+    available through the name attribute of the returned tables. Use the
+    returned tables as a context manager, or call close() then unlink(), to
+    free the segment.
+    """
+
+    shared_memory = SharedMemory(
+        name=name, create=True, size=tables_size(len(cylinder)))
+    try:
+        write_tables(cylinder, shared_memory.buf)
+        return CylinderTables(shared_memory.buf, shared_memory, owner=True)
+    except BaseException:
+        shared_memory.close()
+        shared_memory.unlink()
+        raise
+
+
+def attach_cylinder(name: str) -> CylinderTables:
+    """Attach to cylinder tables previously published under the given name.
+    Nothing is copied. Call close() (or use it as a context manager) once
+    done; attaching never destroys the segment.
+    """
+
+    shared_memory = open_untracked_shared_memory(name)
+    try:
+        return CylinderTables(shared_memory.buf, shared_memory)
+    except BaseException:
+        shared_memory.close()
+        raise
+
+
+def open_untracked_shared_memory(name: str) -> SharedMemory:
+    """Open an existing shared memory segment without registering it to the
+    resource tracker, which would otherwise destroy it when the attaching
+    process exits.
+    """
+
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+
+    install_untracked_register()
+    UNTRACKED.opening = True
+    try:
+        return SharedMemory(name=name)
+    finally:
+        UNTRACKED.opening = False
+
+
+def install_untracked_register() -> None:
+    """Wrap resource_tracker.register, once, so that it skips the segment
+    being opened by open_untracked_shared_memory() in the calling thread
+    only. Segments created meanwhile by other threads are still tracked.
+
+    Unregistering the segment after opening it is not an option: worker
+    processes share the resource tracker of their parent, so that would also
+    drop the registration of the publishing process.
+    """
+
+    global TRACKER_REGISTER
+
+    with TRACKER_LOCK:
+        if TRACKER_REGISTER is not None:
+            return
+        TRACKER_REGISTER = resource_tracker.register
+
+        def register(name: str, rtype: str) -> None:
+            if rtype == 'shared_memory' and getattr(UNTRACKED, 'opening',
+                                                    False):
+                return
+            TRACKER_REGISTER(name, rtype)
+
+        resource_tracker.register = register
+
+
+@instrumented('encrypt', lambda arguments, result: {
+    'encrypted_messages_total': 1,
+    'encrypted_letters_total': len(result)
+})
+def cipher_message_with_tables(message: str, key: Key,
+                               tables: CylinderTables) -> str:
+    """Encrypt message like cipher_message() does, using prepared tables
+    instead of the cylinder dict.
+    """
+
+    if not is_key_valid(key, len(key)):
+        raise InvalidKeyError("The key provided is not valid.")
+
+    disks = tables.disks
+    positions = tables.positions
+    ciphered = bytearray()
+    for index, letter in enumerate(sanitize_message(message).encode('ascii')):
+        row = tables._row(key[index])
+        position = positions[row + letter - ORD_A]
+        position = -1 if position == MISSING else position
+        ciphered.append(disks[row + (position + 6) % 26])
+    return ciphered.decode('ascii')
+
+
+@instrumented('decrypt', lambda arguments, result: {
+    'decrypted_messages_total': 1,
+    'decrypted_letters_total': len(result)
+})
+def decipher_message_with_tables(message: str, key: Key,
+                                 tables: CylinderTables) -> str:
+    """Decrypt message like decipher_message() does, using prepared tables
+    instead of the cylinder dict.
+    """
+
+    if not is_key_valid(key, len(key)):
+        raise InvalidKeyError("The key provided is not valid.")
+
+    disks = tables.disks
+    deciphered = bytearray()
+    for index, letter in enumerate(message):
+        row = tables._row(key[index])
+        position = tables.position(key[index], letter)
+        deciphered.append(disks[row + (position - 6) % 26])
+    return deciphered.decode('ascii')
@@ -0,0 +1,174 @@
+"""Integrity checks and fingerprints of cylinders.
+
+A valid disk is a permutation of the 26 uppercase letters. Each line of a
+cylinder file is checked in a single pass, without building the cylinder
+first, so files of millions of disks can be validated; every bad line is
+reported with its number (which is also the number of its disk). The same
+pass can also build the cylinder, when it is to be loaded anyway.
+
+The fingerprint of a cylinder is the SHA-256 of its disks along with their
+numbers. It only depends on the content of the cylinder, not on the file it
+comes from, so caches and stores can key prepared tables by it. Running this
+file checks cylinder files and prints their fingerprints:
+
+    python3 src/cylinder_validation.py cylinder.txt [other-cylinder.txt ...]
+"""
+
+import sys
+from hashlib import sha256
+from string import ascii_uppercase
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Type aliases
+Filename = str
+Disk = str
+Cylinder = Dict[int, Disk]
+Problem = Tuple[int, str]
+
+# Bit of each letter in the mask of a disk
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(ascii_uppercase)}
+FULL_MASK = (1 << 26) - 1
+# Number of problems listed in the message of an InvalidCylinderError
+PROBLEMS_IN_MESSAGE = 5
+
+CylinderCheck = NamedTuple('CylinderCheck', [('number_of_disks', int),
+                                             ('fingerprint', str),
+                                             ('problems', List[Problem])])
+
+
+class InvalidCylinderError(Exception):
+    """Raised when a disk of a cylinder is not a permutation of the 26
+    uppercase letters. problems holds the (line number, description) of every
+    bad line.
+    """
+
+    def __init__(self, source: str, problems: List[Problem]) -> None:
+        lines = [
+            'line {}: {}'.format(number, description)
+            for number, description in problems[:PROBLEMS_IN_MESSAGE]
+        ]
+        if len(problems) > PROBLEMS_IN_MESSAGE:
+            lines.append('and {} more bad lines'.format(
+                len(problems) - PROBLEMS_IN_MESSAGE))
+        super().__init__('{} is not a valid cylinder: {}.'.format(
+            source, '; '.join(lines)))
+        self.problems = problems
+
+
+def main() -> None:
+    """Check every cylinder file given on the command line."""
+
+    all_valid = True
+    for file in sys.argv[1:]:
+        check = check_cylinder_file(file)
+        if check.problems:
+            all_valid = False
+            for number, description in check.problems:
+                print('{}:{}: {}'.format(file, number, description))
+        else:
+            print('{}: {} disks, sha256 {}'.format(file, check.number_of_disks,
+                                                   check.fingerprint))
+    if not all_valid:
+        sys.exit(1)
+
+
+def is_disk_valid(disk: Disk) -> bool:
+    """Check if disk is a permutation of the 26 uppercase letters."""
+
+    if len(disk) != 26:
+        return False
+    try:
+        # 26 powers of two add up to the full mask only if they are all
+        # different, so it is cheaper than or-ing them
+        return sum(map(LETTER_BITS.__getitem__, disk)) == FULL_MASK
+    except KeyError:
+        return False
+
+
+def disk_problem(disk: Disk) -> str:
+    """Describe what is wrong with an invalid disk."""
+
+    problems = []
+    if len(disk) != 26:
+        problems.append('{} characters instead of 26'.format(len(disk)))
+    invalid = sorted(set(c for c in disk if c not in LETTER_BITS))
+    if invalid:
+        problems.append('not uppercase letters: {}'.format(', '.join(
+            map(repr, invalid))))
+    mask = 0
+    repeated = set()
+    for letter in disk:
+        bit = LETTER_BITS.get(letter, 0)
+        if mask & bit:
+            repeated.add(letter)
+        mask |= bit
+    if repeated:
+        problems.append('repeated letters: {}'.format(''.join(
+            sorted(repeated))))
+    if mask != FULL_MASK:
+        problems.append('missing letters: {}'.format(''.join(
+            letter for letter, bit in LETTER_BITS.items() if not mask & bit)))
+    return ', '.join(problems)
+
+
+def check_lines(lines: Iterable[str],
+                cylinder: Optional[Cylinder]=None) -> CylinderCheck:
+    """Check the lines of a cylinder, with or without their line break, the
+    way load_cylinder_from_file() reads them: empty lines are skipped but
+    still numbered. Given a cylinder, the disks are also added to it by
+    number, so that the file is loaded in the same pass.
+    """
+
+    fingerprint = sha256()
+    number_of_disks = 0
+    problems = []  # type: List[Problem]
+    for number, line in enumerate(lines, 1):
+        disk = line[:-1] if line.endswith('\n') else line
+        if disk == '':
+            continue
+        number_of_disks += 1
+        if cylinder is not None:
+            cylinder[number] = disk
+        if not is_disk_valid(disk):
+            problems.append((number, disk_problem(disk)))
+        fingerprint.update(fingerprint_entry(number, disk))
+    return CylinderCheck(number_of_disks, fingerprint.hexdigest(), problems)
+
+
+def check_cylinder_file(file: Filename) -> CylinderCheck:
+    """Check every line of a cylinder file, reading it line by line."""
+
+    with open(file, 'r', errors='replace') as f:
+        return check_lines(f)
+
+
+def validate_cylinder_file(file: Filename) -> CylinderCheck:
+    """Check a cylinder file, raise an InvalidCylinderError if a line is
+    bad.
+    """
+
+    check = check_cylinder_file(file)
+    if check.problems:
+        raise InvalidCylinderError(file, check.problems)
+    return check
+
+
+def cylinder_fingerprint(cylinder: Cylinder) -> str:
+    """Return the fingerprint of a cylinder, the same as the one of the file
+    it was loaded from.
+    """
+
+    fingerprint = sha256()
+    for number in sorted(cylinder):
+        fingerprint.update(fingerprint_entry(number, cylinder[number]))
+    return fingerprint.hexdigest()
+
+
+def fingerprint_entry(number: int, disk: Disk) -> bytes:
+    """Return what a disk adds to the fingerprint of its cylinder."""
+
+    return '{}:{}\n'.format(number, disk).encode('utf-8', 'replace')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""Depth attack: recover the key shared by several messages encrypted with a
+known cylinder.
+
+A position is encrypted by the same disk in every message, so the letters
+found at that position across all the messages constrain one disk together:
+ * with known plaintexts (cribs), the candidates at a position are the disks
+   turning each known plaintext letter into its ciphertext letter, i.e. the
+   intersection of the candidates given by each message
+ * with ciphertexts only, each disk is scored by how much the letters it
+   decrypts at that position look like English
+Either way each (position, disk) pair gets a score, and the key is the
+assignment of distinct disks to the positions with the best total score.
+
+Letters are counted per position first, so scoring the disks costs the same
+whatever the number of messages. Counting and scoring are split over worker
+processes for large batches of messages and large cylinders.
+
+NumPy is optional; when installed, counting, scoring and matching are
+vectorized.
+
+    python3 src/depth_attack.py cylinder.txt ciphertexts.txt
+    python3 src/depth_attack.py cylinder.txt ciphertexts.txt -p cribs.txt
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from math import log
+from string import ascii_uppercase
+from typing import Any, Dict, List, Optional
+
+from ciphertext_statistics import ENGLISH_FREQUENCIES
+from cylinder_validation import InvalidCylinderError
+from JeffersonShell import (cipher_letter, decipher_letter,
+                            load_cylinder_from_file, sanitize_message)
+from letter_arrays import HAS_NUMPY, ORD_A, flatten_messages, letter_codes
+
+if HAS_NUMPY:
+    import numpy
+
+# Type aliases
+Disk = str
+Cylinder = Dict[int, Disk]
+Key = List[int]
+Filename = str
+Attack = Dict[str, Any]
+
+UNKNOWN_LETTER = '?'
+# Below these sizes, worker processes cost more than they save
+PARALLEL_LETTERS = 100000
+PARALLEL_SCORES = 100000
+
+
+def main() -> None:
+    """Parse the command line arguments and print the recovered key."""
+
+    parser = ArgumentParser(
+        description="Recover the key shared by several ciphertexts.")
+    parser.add_argument('cylinder', help="cylinder file")
+    parser.add_argument('ciphertexts', help="ciphertexts file, one per line")
+    parser.add_argument(
+        '-p', '--plaintexts',
+        help="known plaintexts file, one per line matching the ciphertexts, "
+        "'?' standing for unknown letters")
+    parser.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help="number of worker processes")
+    arguments = parser.parse_args()
+
+    try:
+        cylinder = load_cylinder_from_file(arguments.cylinder, validate=True)
+    except InvalidCylinderError as error:
+        parser.error(str(error))
+    ciphertexts = read_lines(arguments.ciphertexts)
+    plaintexts = (read_lines(arguments.plaintexts)
+                  if arguments.plaintexts else None)
+    attack = recover_key(ciphertexts, cylinder, plaintexts, arguments.workers)
+
+    print("Key: " + ' '.join(map(str, attack['key'])))
+    if 'consistent' in attack:
+        if not attack['consistent']:
+            print("No key is consistent with every plaintext; this key "
+                  "contradicts the fewest letters.")
+        ambiguous = [
+            str(position + 1)
+            for position, disks in enumerate(attack['candidates'])
+            if len(disks) > 1
+        ]
+        if ambiguous:
+            print("Several disks fit positions " + ', '.join(ambiguous))
+
+
+def read_lines(file: Filename) -> List[str]:
+    """Return the lines of file, without their line break."""
+
+    with open(file, 'r') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+def recover_key(ciphertexts: List[str],
+                cylinder: Cylinder,
+                plaintexts: Optional[List[str]]=None,
+                workers: int=1) -> Attack:
+    """Return the most likely key prefix used to encrypt every ciphertext,
+    one disk per position up to the longest ciphertext, with its 'score'.
+
+    With plaintexts (one per ciphertext, '?' for unknown letters) the result
+    also holds the 'candidates' disks of each position, consistent with every
+    known letter, and whether the key is 'consistent' with all of them.
+    """
+
+    ciphertexts = [sanitize_message(message) for message in ciphertexts]
+    if plaintexts is not None:
+        if len(plaintexts) != len(ciphertexts):
+            raise ValueError("There must be one plaintext per ciphertext.")
+        plaintexts = [sanitize_crib(crib) for crib in plaintexts]
+
+    disk_numbers = sorted(cylinder)
+    length = max((len(message) for message in ciphertexts), default=0)
+    if length > len(disk_numbers):
+        raise ValueError(
+            "Ciphertexts are longer than the number of disks of the "
+            "cylinder.")
+    if length == 0:
+        return attack_result([], [], disk_numbers, plaintexts is not None)
+
+    counts = count_letters(ciphertexts, plaintexts, length, workers)
+    weights = disk_weights(cylinder, disk_numbers, plaintexts is not None)
+    scores = score_disks(counts, weights, workers)
+    return attack_result(scores, best_assignment(scores), disk_numbers,
+                         plaintexts is not None)
+
+
+def sanitize_crib(crib: str) -> str:
+    """Like sanitize_message(), keeping the unknown letter marks."""
+
+    return ''.join(character for character in crib.upper()
+                   if character in ascii_uppercase or
+                   character == UNKNOWN_LETTER)
+
+
+def attack_result(scores: Any, assignment: List[int], disk_numbers: Key,
+                  with_plaintexts: bool) -> Attack:
+    """Describe the outcome of the attack, see recover_key()."""
+
+    rows = [list(row) for row in scores]
+    score = sum(rows[position][disk] for position, disk in
+                enumerate(assignment))
+    attack = {
+        'key': [disk_numbers[disk] for disk in assignment],
+        'score': float(score)
+    }  # type: Attack
+    if with_plaintexts:
+        # A disk scores 0 at a position if it contradicts no known letter
+        attack['candidates'] = [
+            [disk_numbers[disk] for disk, value in enumerate(row) if value == 0]
+            for row in rows
+        ]
+        attack['consistent'] = score == 0
+    return attack
+
+
+def count_letters(ciphertexts: List[str], plaintexts: Optional[List[str]],
+                  length: int, workers: int=1) -> Any:
+    """Count the letters of each position of the ciphertexts: a row of 26
+    counts per position, or with plaintexts a row of 26 × 26 counts of the
+    (plaintext letter, ciphertext letter) pairs.
+    """
+
+    letters = sum(len(message) for message in ciphertexts)
+    if workers <= 1 or letters < PARALLEL_LETTERS:
+        return count_chunk(ciphertexts, plaintexts, length)
+
+    chunk_size = -(-len(ciphertexts) // workers)
+    starts = range(0, len(ciphertexts), chunk_size)
+    ciphertext_chunks = [ciphertexts[i:i + chunk_size] for i in starts]
+    plaintext_chunks = ([plaintexts[i:i + chunk_size] for i in starts]
+                        if plaintexts is not None else repeat(None))
+    with ProcessPoolExecutor(workers) as executor:
+        partials = list(
+            executor.map(count_chunk, ciphertext_chunks, plaintext_chunks,
+                         repeat(length)))
+    if HAS_NUMPY:
+        return sum(partials[1:], partials[0])
+    return [[sum(values) for values in zip(*rows)] for rows in zip(*partials)]
+
+
+def count_chunk(ciphertexts: List[str], plaintexts: Optional[List[str]],
+                length: int) -> Any:
+    """Count the letters of some ciphertexts, see count_letters()."""
+
+    if HAS_NUMPY:
+        return count_chunk_vectorized(ciphertexts, plaintexts, length)
+
+    width = 26 * 26 if plaintexts is not None else 26
+    counts = [[0] * width for _ in range(length)]
+    if plaintexts is None:
+        for message in ciphertexts:
+            for position, letter in enumerate(message):
+                counts[position][ord(letter) - ORD_A] += 1
+        return counts
+
+    for crib, message in zip(plaintexts, ciphertexts):
+        for position, (clear, letter) in enumerate(zip(crib, message)):
+            if clear != UNKNOWN_LETTER:
+                counts[position][(ord(clear) - ORD_A) * 26 + ord(letter) -
+                                 ORD_A] += 1
+    return counts
+
+
+def count_chunk_vectorized(ciphertexts: List[str],
+                           plaintexts: Optional[List[str]],
+                           length: int) -> Any:
+    """Same as count_chunk(), with NumPy."""
+
+    if plaintexts is not None:
+        # Only the letters having a plaintext counterpart are counted
+        ciphertexts = [message[:len(crib)]
+                       for crib, message in zip(plaintexts, ciphertexts)]
+        plaintexts = [crib[:len(message)]
+                      for crib, message in zip(plaintexts, ciphertexts)]
+
+    letters, positions, _ = flatten_messages(ciphertexts)
+
+    if plaintexts is None:
+        return numpy.bincount(positions * 26 + letters,
+                              minlength=length * 26).reshape(length, 26)
+
+    clears = letter_codes(plaintexts)
+    known = clears != ord(UNKNOWN_LETTER) - ORD_A
+    pairs = clears[known] * 26 + letters[known]
+    return numpy.bincount(positions[known] * 26 * 26 + pairs,
+                          minlength=length * 26 * 26).reshape(length, 26 * 26)
+
+
+def disk_weights(cylinder: Cylinder, disk_numbers: Key,
+                 with_plaintexts: bool) -> Any:
+    """Return a row of weights per disk, such that the score of a disk at a
+    position is the sum of the counts of that position times the weights of
+    the disk:
+     * for letter counts, the log-frequency in English of the letter the
+       disk decrypts each ciphertext letter to
+     * for pair counts, -1 for each pair the disk does not encrypt that way
+    """
+
+    weights = []
+    for number in disk_numbers:
+        disk = cylinder[number]
+        if with_plaintexts:
+            row = [-1.0] * (26 * 26)
+            for clear, letter in enumerate(ascii_uppercase):
+                row[clear * 26 + ord(cipher_letter(letter, disk)) -
+                    ORD_A] = 0.0
+        else:
+            row = [
+                log(ENGLISH_FREQUENCIES[ord(decipher_letter(letter, disk)) -
+                                        ORD_A]) for letter in ascii_uppercase
+            ]
+        weights.append(row)
+    return numpy.array(weights) if HAS_NUMPY else weights
+
+
+def score_disks(counts: Any, weights: Any, workers: int=1) -> Any:
+    """Return the score of every disk (columns) at every position (rows),
+    see disk_weights().
+    """
+
+    if workers <= 1 or len(counts) * len(weights) < PARALLEL_SCORES:
+        return score_chunk(counts, weights)
+
+    chunk_size = -(-len(weights) // workers)
+    weight_chunks = [weights[i:i + chunk_size]
+                     for i in range(0, len(weights), chunk_size)]
+    with ProcessPoolExecutor(workers) as executor:
+        partials = list(
+            executor.map(score_chunk, repeat(counts), weight_chunks))
+    if HAS_NUMPY:
+        return numpy.hstack(partials)
+    return [sum(rows, []) for rows in zip(*partials)]
+
+
+def score_chunk(counts: Any, weights: Any) -> Any:
+    """Score some disks, see score_disks()."""
+
+    if HAS_NUMPY:
+        return counts @ weights.T
+
+    scores = []
+    for row in counts:
+        counted = [(index, count) for index, count in enumerate(row) if count]
+        scores.append([
+            sum(count * disk[index] for index, count in counted)
+            for disk in weights
+        ])
+    return scores
+
+
+def best_assignment(scores: Any) -> List[int]:
+    """Return for each row of scores a distinct column, such that the total
+    score is the highest possible. There must be no more rows than columns.
+
+    It is the Hungarian algorithm, in O(rows² × columns).
+    """
+
+    if len(scores) == 0:
+        return []
+    if HAS_NUMPY:
+        return best_assignment_vectorized(numpy.asarray(scores, float))
+
+    rows = len(scores)
+    columns = len(scores[0])
+    infinity = float('inf')
+    # Potentials of rows and columns, the row matched to each column and the
+    # previous column on the augmenting path, all shifted by one
+    row_potentials = [0.0] * (rows + 1)
+    column_potentials = [0.0] * (columns + 1)
+    matches = [0] * (columns + 1)
+    previous = [0] * (columns + 1)
+
+    for row in range(1, rows + 1):
+        matches[0] = row
+        column = 0
+        slack = [infinity] * (columns + 1)
+        visited = [False] * (columns + 1)
+        while matches[column] != 0:
+            visited[column] = True
+            matched_row = matches[column]
+            delta = infinity
+            next_column = 0
+            for j in range(1, columns + 1):
+                if visited[j]:
+                    continue
+                reduced = (-scores[matched_row - 1][j - 1] -
+                           row_potentials[matched_row] - column_potentials[j])
+                if reduced < slack[j]:
+                    slack[j] = reduced
+                    previous[j] = column
+                if slack[j] < delta:
+                    delta = slack[j]
+                    next_column = j
+            for j in range(columns + 1):
+                if visited[j]:
+                    row_potentials[matches[j]] += delta
+                    column_potentials[j] -= delta
+                else:
+                    slack[j] -= delta
+            column = next_column
+        while column != 0:
+            matches[column] = matches[previous[column]]
+            column = previous[column]
+
+    assignment = [0] * rows
+    for column in range(1, columns + 1):
+        if matches[column] != 0:
+            assignment[matches[column] - 1] = column - 1
+    return assignment
+
+
+def best_assignment_vectorized(scores: Any) -> List[int]:
+    """Same as best_assignment(), with NumPy."""
+
+    rows, columns = scores.shape
+    costs = -scores
+    row_potentials = numpy.zeros(rows + 1)
+    column_potentials = numpy.zeros(columns + 1)
+    matches = numpy.zeros(columns + 1, numpy.intp)
+    previous = numpy.zeros(columns + 1, numpy.intp)
+
+    for row in range(1, rows + 1):
+        matches[0] = row
+        column = 0
+        slack = numpy.full(columns + 1, numpy.inf)
+        visited = numpy.zeros(columns + 1, bool)
+        while matches[column] != 0:
+            visited[column] = True
+            matched_row = matches[column]
+            reduced = numpy.empty(columns + 1)
+            reduced[0] = numpy.inf
+            reduced[1:] = (costs[matched_row - 1] -
+                           row_potentials[matched_row] - column_potentials[1:])
+            lower = ~visited & (reduced < slack)
+            slack[lower] = reduced[lower]
+            previous[lower] = column
+            candidates = numpy.where(visited, numpy.inf, slack)
+            next_column = int(candidates.argmin())
+            delta = candidates[next_column]
+            row_potentials[matches[visited]] += delta
+            column_potentials[visited] -= delta
+            slack[~visited] -= delta
+            column = next_column
+        while column != 0:
+            matches[column] = matches[previous[column]]
+            column = previous[column]
+
+    assignment = [0] * rows
+    for column in range(1, columns + 1):
+        if matches[column] != 0:
+            assignment[matches[column] - 1] = column - 1
+    return assignment
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Opt-in instrumentation of JeffersonShell: how many messages, letters and
+cylinders went through it, how many keys were checked and found invalid, and
+how long each step took.
+
+Nothing is measured until enable_metrics() is called; until then an
+instrumented function only costs one extra call and one flag check. Metrics
+can then be read with stats_snapshot(), or written with
+write_prometheus_textfile() to a file scraped by the textfile collector of
+the Prometheus node exporter. Hooks added with add_hook() are called after
+every instrumented call, to plug in a tracer; a failing hook is logged and
+never affects the instrumented call.
+
+Metrics measured in worker processes are exported with export_metrics() and
+merged into the parent's ones with merge_metrics().
+"""
+
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from inspect import signature
+from os import replace
+from threading import Lock
+from timeit import default_timer
+from typing import (Any, Callable, Dict, Iterator, List, Optional, TypeVar,
+                    cast)
+
+# Type aliases
+Filename = str
+Fields = Dict[str, Any]
+Hook = Callable[[str, Fields], None]
+Arguments = Dict[str, Any]
+Counters = Callable[[Arguments, Any], Dict[str, int]]
+Metrics = Dict[str, Any]
+Function = TypeVar('Function', bound=Callable[..., Any])
+
+# Upper bounds of the latency histograms buckets, in seconds
+LATENCY_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+METRIC_PREFIX = 'jefferson_'
+
+ENABLED = False
+COUNTERS = {}  # type: Dict[str, int]
+HISTOGRAMS = {}  # type: Dict[str, Dict[str, Any]]
+HOOKS = []  # type: List[Hook]
+LOCK = Lock()
+LOGGER = logging.getLogger(__name__)
+
+
+def enable_metrics() -> None:
+    """Start measuring."""
+
+    global ENABLED
+    ENABLED = True
+
+
+def disable_metrics() -> None:
+    """Stop measuring. What was measured so far is kept."""
+
+    global ENABLED
+    ENABLED = False
+
+
+@contextmanager
+def metrics_paused() -> Iterator[None]:
+    """Stop measuring within the block, for calls that are not part of the
+    work being measured.
+    """
+
+    global ENABLED
+    enabled = ENABLED
+    ENABLED = False
+    try:
+        yield
+    finally:
+        ENABLED = enabled
+
+
+def reset_metrics() -> None:
+    """Forget everything measured so far."""
+
+    with LOCK:
+        COUNTERS.clear()
+        HISTOGRAMS.clear()
+
+
+def add_hook(hook: Hook) -> None:
+    """Call hook(step, fields) after every instrumented call, with the name
+    of the step and what was measured (duration, counts, error if any).
+    """
+
+    HOOKS.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    """Stop calling a hook previously added."""
+
+    HOOKS.remove(hook)
+
+
+def instrumented(step: str,
+                 counters: Counters) -> Callable[[Function], Function]:
+    """Decorate a function so that, while metrics are enabled, its duration
+    is recorded in the '<step>_seconds' histogram and the counters returned by
+    counters(arguments, result) are incremented, arguments being those of the
+    call by parameter name. A call raising an exception increments
+    '<step>_errors_total' instead. A failing counters function is logged and
+    never affects the instrumented call.
+    """
+
+    def decorate(function: Function) -> Function:
+        parameters = signature(function)
+
+        @wraps(function)
+        def measured_function(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+
+            start = default_timer()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as error:
+                record(step, default_timer() - start,
+                       {step + '_errors_total': 1},
+                       '{}: {}'.format(type(error).__name__, error))
+                raise
+            seconds = default_timer() - start
+            try:
+                bound = parameters.bind(*args, **kwargs)
+                bound.apply_defaults()
+                increments = counters(bound.arguments, result)
+            except Exception:
+                LOGGER.exception("The counters of step %s failed.", step)
+                increments = {}
+            record(step, seconds, increments)
+            return result
+
+        return cast(Function, measured_function)
+
+    return decorate
+
+
+def record(step: str, seconds: float, increments: Dict[str, int],
+           error: Optional[str]=None) -> None:
+    """Record one instrumented call and pass it on to the hooks."""
+
+    with LOCK:
+        observe(step + '_seconds', seconds)
+        for name, value in increments.items():
+            COUNTERS[name] = COUNTERS.get(name, 0) + value
+
+    fields = {'seconds': seconds}  # type: Fields
+    fields.update(increments)
+    if error is not None:
+        fields['error'] = error
+    for hook in HOOKS:
+        try:
+            hook(step, fields)
+        except Exception:
+            LOGGER.exception("The metrics hook %r failed on step %s.", hook,
+                             step)
+
+
+def observe(name: str, value: float) -> None:
+    """Add a value to a histogram. The caller must hold the lock."""
+
+    histogram = get_histogram(name)
+    histogram['count'] += 1
+    histogram['sum'] += value
+    for index, upper_bound in enumerate(LATENCY_BUCKETS):
+        if value <= upper_bound:
+            histogram['buckets'][index] += 1
+            break
+
+
+def get_histogram(name: str) -> Dict[str, Any]:
+    """Return a histogram, creating it empty if needed. The caller must hold
+    the lock.
+    """
+
+    if name not in HISTOGRAMS:
+        HISTOGRAMS[name] = {
+            'count': 0,
+            'sum': 0.0,
+            'buckets': [0] * len(LATENCY_BUCKETS)
+        }
+    return HISTOGRAMS[name]
+
+
+def stats_snapshot() -> Dict[str, Any]:
+    """Return a copy of every counter and histogram. Histograms buckets are
+    cumulative, keyed by their upper bound.
+    """
+
+    with LOCK:
+        return {
+            'counters': dict(COUNTERS),
+            'histograms': {
+                name: {
+                    'count': histogram['count'],
+                    'sum': histogram['sum'],
+                    'buckets': cumulative_buckets(histogram['buckets'])
+                }
+                for name, histogram in HISTOGRAMS.items()
+            }
+        }
+
+
+def export_metrics() -> Metrics:
+    """Return a copy of every counter and histogram, as merge_metrics()
+    takes them, e.g. to send them from a worker process to its parent.
+    """
+
+    with LOCK:
+        return {
+            'counters': dict(COUNTERS),
+            'histograms': {
+                name: {
+                    'count': histogram['count'],
+                    'sum': histogram['sum'],
+                    'buckets': list(histogram['buckets'])
+                }
+                for name, histogram in HISTOGRAMS.items()
+            }
+        }
+
+
+def merge_metrics(metrics: Metrics) -> None:
+    """Add metrics returned by export_metrics() to the ones measured here."""
+
+    with LOCK:
+        for name, value in metrics['counters'].items():
+            COUNTERS[name] = COUNTERS.get(name, 0) + value
+        for name, other in metrics['histograms'].items():
+            histogram = get_histogram(name)
+            histogram['count'] += other['count']
+            histogram['sum'] += other['sum']
+            histogram['buckets'] = [
+                count + other_count for count, other_count in zip(
+                    histogram['buckets'], other['buckets'])
+            ]
+
+
+def cumulative_buckets(buckets: List[int]) -> Dict[float, int]:
+    """Return the number of values below each bucket's upper bound."""
+
+    cumulated = {}  # type: Dict[float, int]
+    total = 0
+    for upper_bound, count in zip(LATENCY_BUCKETS, buckets):
+        total += count
+        cumulated[upper_bound] = total
+    return cumulated
+
+
+def prometheus_text() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+
+    snapshot = stats_snapshot()
+    lines = []
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append('# TYPE {}{} counter'.format(METRIC_PREFIX, name))
+        lines.append('{}{} {}'.format(METRIC_PREFIX, name, value))
+    for name, histogram in sorted(snapshot['histograms'].items()):
+        metric = METRIC_PREFIX + name
+        lines.append('# TYPE {} histogram'.format(metric))
+        for upper_bound, count in histogram['buckets'].items():
+            lines.append('{}_bucket{{le="{}"}} {}'.format(metric, upper_bound,
+                                                         count))
+        lines.append('{}_bucket{{le="+Inf"}} {}'.format(metric, histogram[
+            'count']))
+        lines.append('{}_sum {}'.format(metric, histogram['sum']))
+        lines.append('{}_count {}'.format(metric, histogram['count']))
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(file: Filename) -> None:
+    """Write every metric to file, atomically so that a scrape never reads a
+    half written file. For the node exporter, the file name must end with
+    '.prom'.
+    """
+
+    temporary_file = file + '.tmp'
+    with open(temporary_file, 'w') as f:
+        f.write(prometheus_text())
+    replace(temporary_file, file)
@@ -8,6 +8,9 @@ WINDOW_DIMENSIONS = (1500, 1000)  # (width, heigth)
 WINDOW_CAPTION = 'Jefferson Disk'
 FONT_NAME = 'FixedSys'
 FONT_SIZE = 32
+PREVIEW_FONT_SIZE = 20  # Largest size of the message preview letters
 FONT_COLOR = WHITE
 BUTTON_FG_COLOR = BLACK
 BUTTON_BG_COLOR = WHITE
+BUTTON_FONT_SIZE = 26  # Of the buttons labelled with words
+DISK_ROTATION_EASING = 0.5  # Part of the way a rotation is shown per frame
@@ -0,0 +1,327 @@
+"""Pick the fastest way to encrypt or decrypt a batch of messages.
+
+Three kernels are available:
+ * 'reference': cipher_message() and decipher_message() from JeffersonShell
+ * 'table': the prepared cylinder tables of cylinder_tables
+ * 'vectorized': the NumPy kernel of vectorized_cipher, if NumPy is installed
+
+The first time a kernel has to be chosen, every kernel is timed over a small
+grid of message lengths and batch sizes. The fastest kernel of each cell of
+the grid is cached on disk, and each call then uses the one of the nearest
+cell. Setting the JEFFERSON_KERNEL environment variable to the name of a
+kernel forces its use, which is handy for debugging and benchmarking.
+"""
+
+import json
+import sys
+from math import log
+from os import environ, getpid, replace
+from random import seed
+from timeit import default_timer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cylinder_tables import (CylinderTables, cipher_message_with_tables,
+                             decipher_message_with_tables, prepare_cylinder)
+from engine_metrics import metrics_paused
+from JeffersonShell import (InvalidKeyError, cipher_message, decipher_message,
+                            generate_disk, generate_key, is_key_valid)
+from user_cache import cache_file
+from vectorized_cipher import (HAS_NUMPY, cipher_messages_vectorized,
+                               decipher_messages_vectorized)
+
+# Type aliases
+Calibration = Dict[str, Any]
+Disk = str
+Cylinder = Dict[int, Disk]
+Filename = str
+Key = List[int]
+Kernel = Callable[[List[str], Key, Cylinder], List[str]]
+
+CALIBRATION_VERSION = 2
+CALIBRATION_LENGTHS = [8, 64, 512]
+CALIBRATION_BATCH_SIZES = [1, 8, 64]
+CALIBRATION_REPEAT = 3
+KERNEL_ENVIRONMENT_VARIABLE = 'JEFFERSON_KERNEL'
+
+# Calibration loaded or computed on first use
+CALIBRATION = None  # type: Optional[Calibration]
+
+
+def reference_cipher(messages: List[str], key: Key,
+                     cylinder: Cylinder) -> List[str]:
+    """Encrypt every message with cipher_message()."""
+
+    return [cipher_message(message, key, cylinder) for message in messages]
+
+
+def reference_decipher(messages: List[str], key: Key,
+                       cylinder: Cylinder) -> List[str]:
+    """Decrypt every message with decipher_message()."""
+
+    return [decipher_message(message, key, cylinder) for message in messages]
+
+
+def table_cipher(messages: List[str], key: Key,
+                 cylinder: Cylinder) -> List[str]:
+    """Encrypt every message with the tables of the disks they use."""
+
+    tables, tables_key = prepare_key_tables(messages, key, cylinder)
+    with tables:
+        return [
+            cipher_message_with_tables(message, tables_key, tables)
+            for message in messages
+        ]
+
+
+def table_decipher(messages: List[str], key: Key,
+                   cylinder: Cylinder) -> List[str]:
+    """Decrypt every message with the tables of the disks they use."""
+
+    tables, tables_key = prepare_key_tables(messages, key, cylinder)
+    with tables:
+        return [
+            decipher_message_with_tables(message, tables_key, tables)
+            for message in messages
+        ]
+
+
+def prepare_key_tables(messages: List[str], key: Key,
+                       cylinder: Cylinder) -> Tuple[CylinderTables, Key]:
+    """Prepare the tables of the disks of key[:longest] only, the ones the
+    messages can use, numbered in key order. Return them along with the key
+    matching that numbering. Preparing the whole cylinder would cost as much
+    as the messages themselves on large cylinders.
+    """
+
+    if not is_key_valid(key, len(key)):
+        raise InvalidKeyError("The key provided is not valid.")
+    longest = max((len(message) for message in messages), default=0)
+    used_disks = key[:longest]
+    tables = prepare_cylinder({
+        location + 1: cylinder[disk_number]
+        for location, disk_number in enumerate(used_disks)
+    })
+    return tables, list(range(1, len(used_disks) + 1))
+
+
+CIPHER_KERNELS = {
+    'reference': reference_cipher,
+    'table': table_cipher,
+    'vectorized': cipher_messages_vectorized
+}  # type: Dict[str, Kernel]
+
+DECIPHER_KERNELS = {
+    'reference': reference_decipher,
+    'table': table_decipher,
+    'vectorized': decipher_messages_vectorized
+}  # type: Dict[str, Kernel]
+
+
+def available_kernels() -> List[str]:
+    """Return the names of the kernels usable in this environment."""
+
+    return [
+        name for name in sorted(CIPHER_KERNELS)
+        if name != 'vectorized' or HAS_NUMPY
+    ]
+
+
+def cipher_messages(messages: List[str],
+                    key: Key,
+                    cylinder: Cylinder,
+                    kernel: Optional[str]=None) -> List[str]:
+    """Encrypt every message with the fastest kernel for this batch, or with
+    the given kernel.
+    """
+
+    kernel = kernel or select_kernel(average_length(messages), len(messages))
+    return CIPHER_KERNELS[kernel](messages, key, cylinder)
+
+
+def decipher_messages(messages: List[str],
+                      key: Key,
+                      cylinder: Cylinder,
+                      kernel: Optional[str]=None) -> List[str]:
+    """Decrypt every message with the fastest kernel for this batch, or with
+    the given kernel.
+    """
+
+    kernel = kernel or select_kernel(average_length(messages), len(messages))
+    return DECIPHER_KERNELS[kernel](messages, key, cylinder)
+
+
+def select_kernel(message_length: int, batch_size: int) -> str:
+    """Return the name of the kernel to use for a batch of batch_size
+    messages of about message_length letters each.
+    """
+
+    forced = forced_kernel()
+    if forced:
+        return forced
+
+    calibration = get_calibration()
+    row = nearest_index(calibration['lengths'], message_length)
+    column = nearest_index(calibration['batch_sizes'], batch_size)
+    return calibration['fastest'][row][column]
+
+
+def forced_kernel() -> Optional[str]:
+    """Return the kernel forced by KERNEL_ENVIRONMENT_VARIABLE, None if not
+    set. Raise a ValueError if it is not an available kernel.
+    """
+
+    forced = environ.get(KERNEL_ENVIRONMENT_VARIABLE)
+    if forced and forced not in available_kernels():
+        raise ValueError("{}={} is not one of the available kernels: "
+                         "{}.".format(KERNEL_ENVIRONMENT_VARIABLE, forced,
+                                      ', '.join(available_kernels())))
+    return forced or None
+
+
+def prepare_kernel_selection() -> None:
+    """Load or compute the calibration now, unless a kernel is forced, so
+    that processes started afterwards find it cached.
+    """
+
+    if not environ.get(KERNEL_ENVIRONMENT_VARIABLE):
+        get_calibration()
+
+
+def get_calibration() -> Calibration:
+    """Return the calibration, loading it from the disk cache or computing it
+    (and caching it) the first time. Without a usable cache directory, it is
+    computed without being cached.
+    """
+
+    global CALIBRATION
+
+    if CALIBRATION is None:
+        try:
+            file = cache_file('kernel-calibration.json')  # type: Optional[str]
+        except OSError:
+            file = None
+        if file is not None:
+            CALIBRATION = load_calibration(file)
+        if CALIBRATION is None:
+            # The calibration runs are not part of the work being measured
+            with metrics_paused():
+                CALIBRATION = calibrate()
+            if file is not None:
+                save_calibration(CALIBRATION, file)
+    return CALIBRATION
+
+
+def calibrate() -> Calibration:
+    """Time every available kernel over the calibration grid and return,
+    for each cell, the name of the fastest one.
+    """
+
+    seed(28)
+    key = generate_key(max(CALIBRATION_LENGTHS))
+    cylinder = {i: generate_disk() for i in range(1, len(key) + 1)}
+    fastest = []
+    for length in CALIBRATION_LENGTHS:
+        row = []
+        for batch_size in CALIBRATION_BATCH_SIZES:
+            messages = [
+                ''.join(cylinder[i + 1][(i + j) % 26] for i in range(length))
+                for j in range(batch_size)
+            ]
+            timings = {
+                name: time_kernel(CIPHER_KERNELS[name], messages, key,
+                                  cylinder)
+                for name in available_kernels()
+            }
+            row.append(min(timings, key=lambda name: timings[name]))
+        fastest.append(row)
+
+    return {
+        'version': CALIBRATION_VERSION,
+        'environment': calibration_environment(),
+        'lengths': CALIBRATION_LENGTHS,
+        'batch_sizes': CALIBRATION_BATCH_SIZES,
+        'fastest': fastest
+    }
+
+
+def time_kernel(kernel: Kernel, messages: List[str], key: Key,
+                cylinder: Cylinder) -> float:
+    """Return the best time out of a few runs of kernel over messages."""
+
+    best = float('inf')
+    for _ in range(CALIBRATION_REPEAT):
+        start = default_timer()
+        kernel(messages, key, cylinder)
+        best = min(best, default_timer() - start)
+    return best
+
+
+def calibration_environment() -> Dict[str, Any]:
+    """Describe what the calibration depends on. A cached calibration made in
+    another environment is discarded.
+    """
+
+    return {
+        'python': sys.version,
+        'numpy': numpy_version(),
+        'kernels': available_kernels()
+    }
+
+
+def numpy_version() -> Optional[str]:
+    """Return the version of NumPy, None if not installed."""
+
+    if not HAS_NUMPY:
+        return None
+    import numpy
+    return numpy.__version__
+
+
+def load_calibration(file: Filename) -> Optional[Calibration]:
+    """Read a cached calibration, None if missing, unreadable or made in
+    another environment.
+    """
+
+    try:
+        with open(file, 'r') as f:
+            calibration = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(calibration, dict) or
+            calibration.get('version') != CALIBRATION_VERSION or
+            calibration.get('environment') != calibration_environment()):
+        return None
+    return calibration
+
+
+def save_calibration(calibration: Calibration, file: Filename) -> None:
+    """Cache the calibration to file. Failing to do so is not an error, the
+    calibration will just be computed again next time.
+    """
+
+    temporary_file = '{}.{}.tmp'.format(file, getpid())
+    try:
+        with open(temporary_file, 'w') as f:
+            json.dump(calibration, f)
+        # Atomically, processes calibrating at once cannot read it half done
+        replace(temporary_file, file)
+    except OSError:
+        pass
+
+
+def nearest_index(grid: List[int], value: int) -> int:
+    """Return the index of the value in grid the closest to the given one, on
+    a logarithmic scale.
+    """
+
+    value = max(value, 1)
+    return min(
+        range(len(grid)), key=lambda i: abs(log(grid[i]) - log(value)))
+
+
+def average_length(messages: List[str]) -> int:
+    """Return the average length of the messages."""
+
+    if not messages:
+        return 0
+    return sum(len(message) for message in messages) // len(messages)
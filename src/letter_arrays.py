@@ -0,0 +1,37 @@
+"""Lay batches of messages out as flat NumPy arrays, one letter after the
+other, which is how the vectorized code works on a whole batch at once.
+
+NumPy is optional: HAS_NUMPY tells whether these functions can be used.
+"""
+
+from typing import Any, List, Tuple
+
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+ORD_A = ord('A')
+
+
+def letter_codes(messages: List[str]) -> Any:
+    """Return the letters of the messages one after the other, each as its
+    index in the alphabet. Anything but a capital letter falls outside of
+    0 to 25.
+    """
+
+    return numpy.frombuffer(''.join(messages).encode('utf-32-le'),
+                            numpy.uint32).astype(numpy.intp) - ORD_A
+
+
+def flatten_messages(messages: List[str]) -> Tuple[Any, Any, Any]:
+    """Return the letters of the messages as letter_codes() does, along with
+    the position of each letter inside its own message and the length of each
+    message.
+    """
+
+    lengths = numpy.array([len(message) for message in messages], numpy.intp)
+    letters = letter_codes(messages)
+    starts = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    return letters, numpy.arange(len(letters)) - starts, lengths
@@ -0,0 +1,86 @@
+"""Record the input events of a GUI session to a file, and read them back to
+replay the session.
+
+A recording is a JSONL file. Its first line is a header describing the
+session, every other line is an event along with the frame it was handled
+in and the time it happened at (in seconds since the start of the session):
+
+    {"version": 1, "window": [1500, 1000], "disks": 36}
+    {"frame": 12, "time": 0.41, "type": "mouse_up", "pos": [20, 925],
+     "button": 1}
+    {"frame": 80, "time": 2.67, "type": "quit"}
+
+A mouse event recorded without a button is replayed as a left click.
+"""
+
+import json
+from typing import IO, Any, Dict, List, Tuple
+
+# Type aliases
+Filename = str
+RecordedEvent = Dict[str, Any]
+SessionHeader = Dict[str, Any]
+
+RECORDING_VERSION = 1
+
+
+def start_recording(file: Filename, window_dimensions: Tuple[int, int],
+                    number_of_disks: int) -> IO[str]:
+    """Create the recording file, write its header and return it."""
+
+    recording = open(file, 'w')
+    recording.write(
+        json.dumps({
+            'version': RECORDING_VERSION,
+            'window': list(window_dimensions),
+            'disks': number_of_disks
+        }) + '\n')
+    return recording
+
+
+def record_event(recording: IO[str], frame: int, time: float,
+                 event_type: str, **fields: Any) -> None:
+    """Append an event to the recording."""
+
+    event = {'frame': frame, 'time': round(time, 6), 'type': event_type}
+    event.update(fields)
+    recording.write(json.dumps(event) + '\n')
+
+
+def load_recording(
+        file: Filename) -> Tuple[SessionHeader, Dict[int, List[RecordedEvent]]]:
+    """Read a recording, return its header and its events by frame."""
+
+    with open(file, 'r') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != RECORDING_VERSION:
+            raise ValueError("{} is not a session recording.".format(file))
+        events_by_frame = {}  # type: Dict[int, List[RecordedEvent]]
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                events_by_frame.setdefault(event['frame'], []).append(event)
+    return header, events_by_frame
+
+
+def frame_times_report(total_time: float, frame_times: List[float]) -> str:
+    """Summarize the cost of a replayed session."""
+
+    if not frame_times:
+        return "No frame replayed."
+
+    ordered = sorted(frame_times)
+    mean = sum(ordered) / len(ordered)
+    return ("{} frames replayed in {:.1f} ms: "
+            "mean {:.2f} ms, median {:.2f} ms, 95th percentile {:.2f} ms, "
+            "max {:.2f} ms per frame").format(
+                len(ordered), total_time * 1000, mean * 1000,
+                percentile(ordered, 50) * 1000,
+                percentile(ordered, 95) * 1000, ordered[-1] * 1000)
+
+
+def percentile(ordered: List[float], rank: float) -> float:
+    """Return the given percentile of already sorted values."""
+
+    index = round(rank / 100 * (len(ordered) - 1))
+    return ordered[index]
@@ -0,0 +1,28 @@
+"""Location of the small files cached on disk between runs."""
+
+from os import environ, makedirs
+from os.path import expanduser, join
+
+# Type aliases
+Filename = str
+
+
+def cache_dir() -> Filename:
+    """Return the directory where cached files are kept, creating it if
+    needed. It is $JEFFERSON_CACHE_DIR if set, else 'jefferson' inside
+    $XDG_CACHE_HOME (defaulting to ~/.cache). Raise an OSError if it cannot
+    be created: callers are expected to go on without the cache.
+    """
+
+    directory = environ.get('JEFFERSON_CACHE_DIR') or join(
+        environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'), 'jefferson')
+    makedirs(directory, exist_ok=True)
+    return directory
+
+
+def cache_file(name: str) -> Filename:
+    """Return the path to the cached file with the given name. Raise an
+    OSError if the cache directory cannot be created.
+    """
+
+    return join(cache_dir(), name)
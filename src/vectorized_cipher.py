@@ -0,0 +1,98 @@
+"""Encrypt and decrypt batches of messages at once with NumPy. All the
+letters of the batch are laid out in one flat array, so the whole batch costs
+a handful of array operations whatever the number of messages.
+
+NumPy is optional: HAS_NUMPY tells whether these functions can be used.
+"""
+
+from typing import Dict, List
+
+from engine_metrics import instrumented
+from JeffersonShell import InvalidKeyError, is_key_valid, sanitize_message
+from letter_arrays import HAS_NUMPY, ORD_A, flatten_messages
+
+if HAS_NUMPY:
+    import numpy
+
+# Type aliases
+Disk = str
+Cylinder = Dict[int, Disk]
+Key = List[int]
+
+
+@instrumented('encrypt_batch', lambda arguments, result: {
+    'encrypted_messages_total': len(result),
+    'encrypted_letters_total': sum(len(message) for message in result)
+})
+def cipher_messages_vectorized(messages: List[str], key: Key,
+                               cylinder: Cylinder) -> List[str]:
+    """Encrypt every message like cipher_message() does."""
+
+    return shift_messages([sanitize_message(m) for m in messages], key,
+                          cylinder, 6)
+
+
+@instrumented('decrypt_batch', lambda arguments, result: {
+    'decrypted_messages_total': len(result),
+    'decrypted_letters_total': sum(len(message) for message in result)
+})
+def decipher_messages_vectorized(messages: List[str], key: Key,
+                                 cylinder: Cylinder) -> List[str]:
+    """Decrypt every message like decipher_message() does."""
+
+    return shift_messages(messages, key, cylinder, -6)
+
+
+def shift_messages(messages: List[str], key: Key, cylinder: Cylinder,
+                   add: int) -> List[str]:
+    """Replace each letter of each message by the one <add> places further on
+    the disk of its position.
+    """
+
+    if not HAS_NUMPY:
+        raise ImportError("NumPy is required for the vectorized kernel.")
+    if not is_key_valid(key, len(key)):
+        raise InvalidKeyError("The key provided is not valid.")
+
+    letters, letter_positions, lengths = flatten_messages(messages)
+    total = len(letters)
+    if total == 0:
+        return ['' for _ in messages]
+    longest = int(lengths.max())
+    if longest > len(key):
+        raise IndexError("list index out of range")
+
+    disk_numbers = key[:longest]
+    for disk_number in disk_numbers:
+        if disk_number not in cylinder:
+            raise KeyError(disk_number)
+    disks, positions = disk_tables([cylinder[n] for n in disk_numbers])
+
+    is_letter = (letters >= 0) & (letters < 26)
+    found = numpy.full(total, -1, numpy.intp)
+    found[is_letter] = positions[letter_positions[is_letter],
+                                 letters[is_letter]]
+    shifted = disks[letter_positions, (found + add) % 26]
+
+    output = shifted.tobytes().decode('ascii')
+    ends = numpy.cumsum(lengths).tolist()
+    return [
+        output[end - length:end]
+        for end, length in zip(ends, lengths.tolist())
+    ]
+
+
+def disk_tables(disks: List[Disk]):
+    """Return the disks as a matrix of ASCII codes, along with the matrix of
+    where each letter of the alphabet first occurs on each disk (-1 if it
+    does not).
+    """
+
+    codes = numpy.frombuffer(''.join(disks).encode('ascii'),
+                             numpy.uint8).reshape(len(disks), 26)
+    positions = numpy.full((len(disks), 26), -1, numpy.intp)
+    rows = numpy.arange(len(disks))
+    # Walk backward so the first occurence wins, like find() does
+    for index in range(25, -1, -1):
+        positions[rows, codes[:, index].astype(numpy.intp) - ORD_A] = index
+    return codes, positions
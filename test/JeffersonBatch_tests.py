@@ -0,0 +1,172 @@
+import json
+import unittest
+from multiprocessing import get_start_method
+from os import _exit, environ, remove
+from os.path import abspath, dirname, join
+from random import seed
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import JeffersonBatch
+from JeffersonBatch import run_batch
+from kernel_dispatch import available_kernels
+from JeffersonShell import (InvalidCylinderError, InvalidKeyError,
+                            cipher_message, generate_key,
+                            load_cylinder_from_file, write_cylinder_to_file)
+
+REPODIR = dirname(dirname(abspath(__file__)))
+QUESTION_CYLINDER = join(REPODIR, 'cylinder-question.txt')
+QUESTION_KEY = [8, 4, 6, 7, 2, 1, 10, 5, 3, 9]
+
+
+def job_line(**job):
+    return json.dumps(job) + '\n'
+
+
+def crash_worker(tables_name, indexed_jobs, collect_metrics):
+    _exit(1)
+
+
+class JeffersonBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory()
+        environ['JEFFERSON_CACHE_DIR'] = self.cache_dir.name
+        seed(27)
+        self.other_cylinder_file = 'cylinder_batch_test.txt'
+        write_cylinder_to_file(self.other_cylinder_file, 12)
+        self.other_cylinder = load_cylinder_from_file(self.other_cylinder_file)
+        self.other_key = generate_key(12)
+
+    def tearDown(self):
+        remove(self.other_cylinder_file)
+        environ.pop('JEFFERSON_KERNEL', None)
+        del environ['JEFFERSON_CACHE_DIR']
+        self.cache_dir.cleanup()
+
+    def jobs(self):
+        return [
+            job_line(
+                id='question',
+                operation='encrypt',
+                message='Hello world',
+                key=QUESTION_KEY,
+                cylinder=QUESTION_CYLINDER),
+            job_line(
+                operation='encrypt',
+                message='Batch jobs',
+                key=self.other_key,
+                cylinder_id='cylinder_batch_test'),
+            '\n',
+            job_line(
+                id='bad key',
+                operation='encrypt',
+                message='Hello world',
+                key=[1, 1, 2],
+                cylinder=QUESTION_CYLINDER),
+            'not json\n',
+            job_line(
+                operation='decrypt',
+                message='XNUEDNRCHN',
+                key=QUESTION_KEY,
+                cylinder=QUESTION_CYLINDER),
+            job_line(
+                id='missing',
+                operation='encrypt',
+                message='Hello',
+                key=[1],
+                cylinder='no-such-cylinder.txt'),
+            job_line(operation='shred', message='', key=[], cylinder='x')
+        ]
+
+    def check_results(self, results):
+        self.assertEqual([result['index'] for result in results],
+                         list(range(7)))
+        self.assertEqual(results[0], {
+            'index': 0,
+            'id': 'question',
+            'ok': True,
+            'result': 'XNUEDNRCHN'
+        })
+        self.assertEqual(results[1]['result'],
+                         cipher_message('Batch jobs', self.other_key,
+                                        self.other_cylinder))
+        self.assertFalse(results[2]['ok'])
+        self.assertEqual(results[2]['id'], 'bad key')
+        self.assertTrue(results[2]['error'].startswith(
+            InvalidKeyError.__name__))
+        self.assertFalse(results[3]['ok'])
+        self.assertEqual(results[4]['result'], 'HELLOWORLD')
+        self.assertFalse(results[5]['ok'])
+        self.assertTrue(results[5]['error'].startswith('FileNotFoundError'))
+        self.assertFalse(results[6]['ok'])
+
+    def test_run_batch_in_process(self):
+        self.check_results(list(run_batch(self.jobs(), workers=1)))
+
+    def test_run_batch_with_workers(self):
+        self.check_results(
+            list(run_batch(self.jobs(), workers=2, chunk_size=1)))
+
+    @unittest.skipIf(get_start_method() != 'fork',
+                     "workers must see the patched run_jobs")
+    def test_worker_crash(self):
+        with patch.object(JeffersonBatch, 'run_jobs', crash_worker):
+            results = list(run_batch(self.jobs(), workers=2, chunk_size=1))
+        self.assertEqual([result['index'] for result in results],
+                         list(range(7)))
+        self.assertFalse(any(result['ok'] for result in results))
+        self.assertTrue(results[0]['error'].startswith('BrokenProcessPool'))
+        self.assertEqual(results[0]['id'], 'question')
+
+    def test_jobs_sharing_a_key(self):
+        messages = ['Hello world', 'Batch jobs', 'Far too long for the key']
+        jobs = [
+            job_line(
+                operation='encrypt',
+                message=message,
+                key=QUESTION_KEY,
+                cylinder=QUESTION_CYLINDER) for message in messages
+        ]
+        for kernel in available_kernels():
+            environ['JEFFERSON_KERNEL'] = kernel
+            results = list(run_batch(jobs))
+            self.assertEqual(results[0]['result'], 'XNUEDNRCHN')
+            self.assertEqual(len(results[1]['result']), 9)
+            self.assertFalse(results[2]['ok'])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            run_batch(self.jobs(), chunk_size=0)
+
+    def test_invalid_forced_kernel(self):
+        environ['JEFFERSON_KERNEL'] = 'teleportation'
+        with self.assertRaises(ValueError):
+            run_batch(self.jobs())
+
+    def test_invalid_and_identical_cylinders(self):
+        copy_file = 'cylinder_batch_copy_test.txt'
+        bad_file = 'cylinder_batch_bad_test.txt'
+        with open(QUESTION_CYLINDER, 'r') as f, open(copy_file, 'w') as copy:
+            copy.write(f.read())
+        with open(bad_file, 'w') as f:
+            f.write('ABC\n')
+        jobs = [
+            job_line(
+                operation='encrypt',
+                message='Hello world',
+                key=QUESTION_KEY,
+                cylinder=cylinder)
+            for cylinder in (QUESTION_CYLINDER, copy_file, bad_file)
+        ]
+        for workers in (1, 2):
+            results = list(run_batch(jobs, workers=workers))
+            self.assertEqual(results[0]['result'], 'XNUEDNRCHN')
+            self.assertEqual(results[1]['result'], 'XNUEDNRCHN')
+            self.assertTrue(results[2]['error'].startswith(
+                InvalidCylinderError.__name__))
+        remove(copy_file)
+        remove(bad_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import sys
+import unittest
+from copy import deepcopy
+from os import remove
+from unittest.mock import patch
+
+import allocation_profiler
+import JeffersonShell
+from allocation_profiler import (AllocationProfiler, diff_report,
+                                 load_profile, profile_report, save_profile)
+
+KEPT = []
+
+
+def allocate(n):
+    KEPT.append([object() for _ in range(n)])
+
+
+def churn(n):
+    temporary = [object() for _ in range(n)]
+    return len(temporary)
+
+
+class AllocationProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.profiler = AllocationProfiler()
+        self.profiler.start()
+
+    def tearDown(self):
+        self.profiler.stop()
+        KEPT.clear()
+
+    def test_measure(self):
+        with self.profiler.measure('region'):
+            allocate(1000)
+        with self.profiler.measure('region'):
+            allocate(1000)
+
+        region = self.profiler.profile['region']
+        self.assertEqual(region['calls'], 2)
+        self.assertGreater(region['peak_bytes'], 0)
+        line = 'allocation_profiler_tests.py:{}'.format(
+            allocate.__code__.co_firstlineno + 1)
+        line = [l for l in region['lines'] if l.endswith(line)]
+        self.assertEqual(len(line), 1)
+        size, count = region['lines'][line[0]]
+        self.assertGreaterEqual(count, 2000)
+        self.assertGreater(size, 2000 * 16)
+
+    def test_peak_without_sampling(self):
+        with self.profiler.measure('region'):
+            self.assertIsNone(sys.getprofile())
+            churn(10000)
+
+        region = self.profiler.profile['region']
+        self.assertGreater(region['peak_bytes'], 10000 * 16)
+        self.assertEqual(region['peak_samples'], 0)
+        self.assertEqual(region['peak_lines'], {})
+
+    def test_temporary_allocations(self):
+        line = 'allocation_profiler_tests.py:{}'.format(
+            churn.__code__.co_firstlineno + 1)
+        for has_reset_peak in (True, False):
+            self.profiler.stop()
+            self.profiler = AllocationProfiler(peak_sampling=2)
+            self.profiler.start()
+            with patch.object(allocation_profiler, 'HAS_RESET_PEAK',
+                              has_reset_peak):
+                for _ in range(3):
+                    with self.profiler.measure('region'):
+                        churn(10000)
+
+            region = self.profiler.profile['region']
+            self.assertEqual(region['calls'], 3)
+            # The first and third regions are sampled
+            self.assertEqual(region['peak_samples'], 2)
+            self.assertGreater(region['peak_bytes'], 10000 * 16)
+            # Only a few interpreter caches are left allocated
+            left = [size for l, (size, _) in region['lines'].items()
+                    if l.endswith(line)]
+            self.assertLess(sum(left), 1000)
+            peak_line = [l for l in region['peak_lines'] if l.endswith(line)]
+            self.assertEqual(len(peak_line), 1)
+            size, count = region['peak_lines'][peak_line[0]]
+            self.assertGreaterEqual(count, 10000 * region['peak_samples'])
+            self.assertGreater(size, 10000 * 16 * region['peak_samples'])
+        self.assertIsNone(sys.getprofile())
+
+    def test_instrument(self):
+        cipher_message = JeffersonShell.cipher_message
+        self.profiler.instrument(JeffersonShell, 'cipher_message')
+        try:
+            JeffersonShell.cipher_message(
+                "enjoy", [1, 2, 3, 4, 5],
+                {i: "FEWPQLHBDSMCNAXIJTKUOZYVRG"
+                 for i in range(1, 6)})
+        finally:
+            JeffersonShell.cipher_message = cipher_message
+        self.assertEqual(self.profiler.profile['cipher_message']['calls'], 1)
+
+    def test_save_report_and_diff(self):
+        with self.profiler.measure('frame'):
+            allocate(10)
+        before = deepcopy(self.profiler.profile)
+        with self.profiler.measure('frame'):
+            allocate(500)
+
+        file = 'profile_test.json'
+        save_profile(self.profiler.profile, file)
+        after = load_profile(file)
+        remove(file)
+
+        self.assertEqual(after['frame']['calls'], 2)
+        self.assertTrue(profile_report(after).startswith('frame: 2 calls'))
+        report = diff_report(before, after, top=1).split('\n')
+        self.assertTrue(report[0].startswith('frame: calls 1 -> 2'))
+        self.assertEqual(report[1:], ['  left allocated:', report[2]])
+        self.assertIn('allocation_profiler_tests.py', report[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
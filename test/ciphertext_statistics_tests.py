@@ -0,0 +1,133 @@
+import unittest
+from os import listdir, remove
+from os.path import realpath
+from unittest.mock import patch
+
+import ciphertext_statistics
+from ciphertext_statistics import (CiphertextStatistics, chi_squared,
+                                   index_of_coincidence, load_statistics,
+                                   position_scores, save_statistics,
+                                   update_from_file, update_from_files)
+
+
+def quadgram_index(quadgram):
+    index = 0
+    for letter in quadgram:
+        index = index * 26 + ord(letter) - ord('A')
+    return index
+
+
+class CiphertextStatisticsTests(unittest.TestCase):
+    def test_add_messages(self):
+        statistics = CiphertextStatistics()
+        statistics.add_messages(
+            message for message in ["ABCA", "ab", "", "BCAB C"])
+        self.assertEqual(statistics.messages, 4)
+        self.assertEqual(statistics.letters, 11)
+        self.assertEqual(statistics.number_of_positions, 5)
+        self.assertEqual(statistics.position_histogram(0)[:3], [2, 1, 0])
+        self.assertEqual(statistics.position_histogram(1)[:3], [0, 2, 1])
+        self.assertEqual(statistics.position_histogram(4)[:3], [0, 0, 1])
+        self.assertEqual(statistics.position_histogram(9), [0] * 26)
+
+        # AB twice, BC twice, CA twice, AB once more: none across messages
+        self.assertEqual(sum(statistics.bigram_counts), 8)
+        self.assertEqual(statistics.bigram_counts[0 * 26 + 1], 3)
+        self.assertEqual(statistics.bigram_counts[2 * 26 + 0], 2)
+        self.assertEqual(sum(statistics.quadgram_counts), 3)
+        self.assertEqual(statistics.quadgram_counts[quadgram_index("ABCA")],
+                         1)
+        self.assertEqual(statistics.quadgram_counts[quadgram_index("CABC")],
+                         1)
+
+    def test_merge(self):
+        one = CiphertextStatistics()
+        one.add_messages(["ABCA", "ab"])
+        two = CiphertextStatistics()
+        two.add_messages(["", "BCAB C"])
+        one.merge(two)
+
+        both = CiphertextStatistics()
+        both.add_messages(["ABCA", "ab", "", "BCAB C"])
+        self.assertEqual(one.messages, both.messages)
+        self.assertEqual(one.letters, both.letters)
+        self.assertEqual(one.position_counts, both.position_counts)
+        self.assertEqual(one.bigram_counts, both.bigram_counts)
+        self.assertEqual(one.quadgram_counts, both.quadgram_counts)
+
+    def test_scores(self):
+        self.assertEqual(index_of_coincidence([2, 2]), 1 / 3)
+        self.assertEqual(index_of_coincidence([1]), 0.0)
+        self.assertEqual(chi_squared([2, 0], [0.5, 0.5]), 2.0)
+
+        statistics = CiphertextStatistics()
+        statistics.add_messages(["AAB", "ABB", "A"])
+        coincidences, deviations = position_scores(statistics)
+        for position in range(3):
+            histogram = statistics.position_histogram(position)
+            self.assertAlmostEqual(coincidences[position],
+                                   index_of_coincidence(histogram))
+            self.assertAlmostEqual(deviations[position],
+                                   chi_squared(histogram))
+
+    def test_save_and_load_statistics(self):
+        file = 'statistics_test.bin'
+        statistics = CiphertextStatistics()
+        statistics.add_messages(["HELLOWORLD", "XNUEDNRCHN"])
+        statistics.sources['somewhere'] = 42
+        save_statistics(statistics, file)
+        loaded = load_statistics(file)
+        remove(file)
+
+        self.assertEqual(loaded.messages, 2)
+        self.assertEqual(loaded.letters, 20)
+        self.assertEqual(loaded.sources, {'somewhere': 42})
+        self.assertEqual(loaded.position_counts, statistics.position_counts)
+        self.assertEqual(loaded.bigram_counts, statistics.bigram_counts)
+        self.assertEqual(loaded.quadgram_counts, statistics.quadgram_counts)
+
+    def test_interrupted_save_keeps_statistics(self):
+        file = 'statistics_test.bin'
+        statistics = CiphertextStatistics()
+        statistics.add_messages(["HELLOWORLD"])
+        save_statistics(statistics, file)
+
+        statistics.add_messages(["XNUEDNRCHN"])
+        with patch.object(ciphertext_statistics, 'little_endian',
+                          side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                save_statistics(statistics, file)
+        loaded = load_statistics(file)
+        remove(file)
+
+        self.assertEqual(loaded.messages, 1)
+        self.assertEqual(
+            [name for name in listdir('.') if name.startswith(file)], [])
+
+    def test_update_from_file(self):
+        file = 'ciphertexts_test.txt'
+        with open(file, 'w') as f:
+            f.write("XNUEDNRCHN\nVMNFJ\nHALF")
+        statistics = CiphertextStatistics()
+        update_from_file(statistics, file)
+        self.assertEqual(statistics.messages, 2)
+        self.assertEqual(statistics.sources[realpath(file)], 17)
+
+        with open(file, 'a') as f:
+            f.write("WRITTEN\nNEW\n")
+        update_from_files(statistics, [file], workers=2)
+        self.assertEqual(statistics.messages, 4)
+        self.assertEqual(statistics.letters, 10 + 5 + 11 + 3)
+
+        update_from_file(statistics, file)
+        self.assertEqual(statistics.messages, 4)
+
+        with open(file, 'w') as f:
+            f.write("SHORT\n")
+        with self.assertRaises(ValueError):
+            update_from_file(statistics, file)
+        remove(file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import sys
+import unittest
+from multiprocessing import Pool, resource_tracker
+from random import seed
+from threading import Thread
+from unittest.mock import Mock, patch
+
+import cylinder_tables
+from cylinder_tables import (attach_cylinder, cipher_message_with_tables,
+                             decipher_message_with_tables, prepare_cylinder,
+                             publish_cylinder)
+from fixtures import CYLINDER, KEY
+from JeffersonShell import (cipher_message, decipher_message, find,
+                            generate_disk, generate_key)
+
+
+def cipher_in_worker(name, message, key):
+    with attach_cylinder(name) as tables:
+        return cipher_message_with_tables(message, key, tables)
+
+
+class CylinderTablesTests(unittest.TestCase):
+    def test_prepare_cylinder(self):
+        tables = prepare_cylinder(CYLINDER)
+        self.assertIsNone(tables.name)
+        self.assertEqual(tables.number_of_disks, 5)
+        self.assertEqual(tables.to_cylinder(), CYLINDER)
+        self.assertEqual(tables.to_cylinder([4, 2]),
+                         {4: CYLINDER[4], 2: CYLINDER[2]})
+        for disk_number, disk in CYLINDER.items():
+            for letter in "AMZ":
+                self.assertEqual(
+                    tables.position(disk_number, letter), find(letter, disk))
+        self.assertEqual(tables.position(1, "?"), -1)
+        tables.close()
+
+    def test_prepare_cylinder_rejects_bad_cylinders(self):
+        with self.assertRaises(ValueError):
+            prepare_cylinder({1: CYLINDER[1], 3: CYLINDER[3]})
+        with self.assertRaises(ValueError):
+            prepare_cylinder({1: "ABC"})
+
+    def test_cipher_message_with_tables(self):
+        tables = prepare_cylinder(CYLINDER)
+        self.assertEqual(
+            cipher_message_with_tables("en ?J oy", KEY, tables), "VMNFJ")
+        self.assertEqual(
+            decipher_message_with_tables("VMNFJ", KEY, tables), "ENJOY")
+        with self.assertRaises(Exception):
+            cipher_message_with_tables("ENJOY", [1, 1, 2, 3, 4], tables)
+        tables.close()
+
+    def test_tables_match_reference(self):
+        seed(26)
+        cylinder = {i: generate_disk() for i in range(1, 31)}
+        cylinder[7] = "AAAAABBBBBCCCCCDDDDDEEEEEF"  # Not a permutation
+        key = generate_key(30)
+        message = "Onward to the lazy dog and further away"[:30]
+        tables = prepare_cylinder(cylinder)
+        self.assertEqual(
+            cipher_message_with_tables(message, key, tables),
+            cipher_message(message, key, cylinder))
+        self.assertEqual(
+            decipher_message_with_tables("WHATEVER?", key, tables),
+            decipher_message("WHATEVER?", key, cylinder))
+        tables.close()
+
+    def test_publish_and_attach_cylinder(self):
+        with publish_cylinder(CYLINDER) as published:
+            self.assertIsNotNone(published.name)
+            with attach_cylinder(published.name) as attached:
+                self.assertEqual(attached.to_cylinder(), CYLINDER)
+
+            with Pool(2) as pool:
+                results = pool.starmap(
+                    cipher_in_worker,
+                    [(published.name, "enjoy", KEY),
+                     (published.name, "enjoy", [1, 2, 3, 4, 5])])
+            self.assertEqual(results, [
+                cipher_message("enjoy", KEY, CYLINDER),
+                cipher_message("enjoy", [1, 2, 3, 4, 5], CYLINDER)
+            ])
+            name = published.name
+
+        with self.assertRaises(FileNotFoundError):
+            attach_cylinder(name)
+
+    @unittest.skipIf(sys.version_info >= (3, 13), "SharedMemory has track")
+    def test_untracked_only_in_opening_thread(self):
+        cylinder_tables.install_untracked_register()
+        register = Mock()
+        with patch.object(cylinder_tables, 'TRACKER_REGISTER', register):
+            cylinder_tables.UNTRACKED.opening = True
+            try:
+                resource_tracker.register('/opened', 'shared_memory')
+                thread = Thread(
+                    target=resource_tracker.register,
+                    args=('/created', 'shared_memory'))
+                thread.start()
+                thread.join()
+            finally:
+                cylinder_tables.UNTRACKED.opening = False
+        register.assert_called_once_with('/created', 'shared_memory')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from os import remove
+from os.path import abspath, dirname, join
+
+from cylinder_validation import (InvalidCylinderError, check_cylinder_file,
+                                 check_lines, cylinder_fingerprint,
+                                 disk_problem, is_disk_valid,
+                                 validate_cylinder_file)
+from JeffersonShell import (load_and_check_cylinder, load_cylinder_from_file,
+                            read_checked_cylinder)
+
+REPODIR = dirname(dirname(abspath(__file__)))
+EXAMPLE_CYLINDER = join(REPODIR, 'cylinder-example.txt')
+
+
+class CylinderValidationTests(unittest.TestCase):
+    def test_is_disk_valid(self):
+        self.assertTrue(is_disk_valid("FEWPQLHBDSMCNAXIJTKUOZYVRG"))
+        self.assertFalse(is_disk_valid("FEWPQLHBDSMCNAXIJTKUOZYVR"))
+        self.assertFalse(is_disk_valid("FEWPQLHBDSMCNAXIJTKUOZYVRR"))
+        self.assertFalse(is_disk_valid("FEWPQLHBDSMCNAXIJTKUOZYVRg"))
+        self.assertFalse(is_disk_valid("FEWPQLHBDSMCNAXIJTKUOZYVRG "))
+
+    def test_disk_problem(self):
+        self.assertEqual(
+            disk_problem("FEWPQLHBDSMCNAXIJTKUOZYVRR"),
+            "repeated letters: R, missing letters: G")
+        self.assertEqual(
+            disk_problem("FEWPQLHBDSMCNAXIJTKUOZYVR"),
+            "25 characters instead of 26, missing letters: G")
+        self.assertEqual(
+            disk_problem("FEWPQLHBDSMCNAXIJTKUOZYVRg"),
+            "not uppercase letters: 'g', missing letters: G")
+
+    def test_check_lines(self):
+        check = check_lines([
+            "FEWPQLHBDSMCNAXIJTKUOZYVRG\n", "\n",
+            "FEWPQLHBDSMCNAXIJTKUOZYVRR\n", "UGWAEIXHTOVRKSQBNJPCYFMDLZ\n",
+            "abc"
+        ])
+        self.assertEqual(check.number_of_disks, 4)
+        self.assertEqual([number for number, _ in check.problems], [3, 5])
+
+        cylinder = {}
+        lines = ["FEWPQLHBDSMCNAXIJTKUOZYVRG\n", "\n",
+                 "UGWAEIXHTOVRKSQBNJPCYFMDLZ"]
+        self.assertEqual(check_lines(lines, cylinder),
+                         check_lines(lines))
+        self.assertEqual(cylinder, {1: "FEWPQLHBDSMCNAXIJTKUOZYVRG",
+                                    3: "UGWAEIXHTOVRKSQBNJPCYFMDLZ"})
+
+    def test_example_cylinder(self):
+        check = validate_cylinder_file(EXAMPLE_CYLINDER)
+        cylinder = load_cylinder_from_file(EXAMPLE_CYLINDER, validate=True)
+        self.assertEqual(check.number_of_disks, len(cylinder))
+        self.assertEqual(check.fingerprint, cylinder_fingerprint(cylinder))
+        self.assertEqual(len(check.fingerprint), 64)
+        self.assertEqual(load_and_check_cylinder(EXAMPLE_CYLINDER),
+                         (cylinder, check))
+
+    def test_read_checked_cylinder_in_one_pass(self):
+        with open(EXAMPLE_CYLINDER, 'r') as f:
+            # An iterator can only be gone through once
+            cylinder, check = read_checked_cylinder(iter(f.readlines()),
+                                                    EXAMPLE_CYLINDER)
+        self.assertEqual(cylinder, load_cylinder_from_file(EXAMPLE_CYLINDER))
+        self.assertEqual(check, validate_cylinder_file(EXAMPLE_CYLINDER))
+
+    def test_fingerprint_depends_on_content_only(self):
+        file = 'cylinder_validation_test.txt'
+        with open(file, 'w') as f:
+            f.write("FEWPQLHBDSMCNAXIJTKUOZYVRG\n"
+                    "UGWAEIXHTOVRKSQBNJPCYFMDLZ\n")
+        fingerprint = check_cylinder_file(file).fingerprint
+        with open(file, 'w') as f:
+            f.write("FEWPQLHBDSMCNAXIJTKUOZYVRG\r\n"
+                    "UGWAEIXHTOVRKSQBNJPCYFMDLZ")
+        self.assertEqual(check_cylinder_file(file).fingerprint, fingerprint)
+        with open(file, 'w') as f:
+            f.write("UGWAEIXHTOVRKSQBNJPCYFMDLZ\n"
+                    "FEWPQLHBDSMCNAXIJTKUOZYVRG\n")
+        self.assertNotEqual(check_cylinder_file(file).fingerprint,
+                            fingerprint)
+        remove(file)
+
+    def test_invalid_cylinder_file(self):
+        file = 'cylinder_validation_test.txt'
+        with open(file, 'w') as f:
+            for _ in range(8):
+                f.write("FEWPQLHBDSMCNAXIJTKUOZYVRR\n")
+        with self.assertRaises(InvalidCylinderError) as context:
+            validate_cylinder_file(file)
+        self.assertEqual(len(context.exception.problems), 8)
+        self.assertIn('line 1: repeated letters: R', str(context.exception))
+        self.assertIn('and 3 more bad lines', str(context.exception))
+        with self.assertRaises(InvalidCylinderError):
+            load_cylinder_from_file(file, validate=True)
+        with self.assertRaises(InvalidCylinderError):
+            load_and_check_cylinder(file)
+        self.assertEqual(len(load_cylinder_from_file(file)), 8)
+        remove(file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import random
+import unittest
+from unittest.mock import patch
+
+import depth_attack
+from depth_attack import best_assignment, recover_key
+from JeffersonShell import cipher_message, generate_disk
+
+TEXT = (
+    "It was the best of times it was the worst of times it was the age of "
+    "wisdom it was the age of foolishness it was the epoch of belief it was "
+    "the epoch of incredulity it was the season of light it was the season "
+    "of darkness it was the spring of hope it was the winter of despair we "
+    "had everything before us we had nothing before us we were all going "
+    "direct to heaven we were all going direct the other way in short the "
+    "period was so far like the present period that some of its noisiest "
+    "authorities insisted on its being received for good or for evil in the "
+    "superlative degree of comparison only there were a king with a large "
+    "jaw and a queen with a plain face on the throne of england there were a "
+    "king with a large jaw and a queen with a fair face on the throne of "
+    "france in both countries it was clearer than crystal to the lords of "
+    "the state preserves of loaves and fishes that things in general were "
+    "settled for ever").upper().replace(' ', '')
+
+
+class DepthAttackTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(35)
+        self.cylinder = {i: generate_disk() for i in range(1, 21)}
+        self.key = random.sample(range(1, 21), 20)
+        self.plaintexts = [TEXT[i:i + 12] for i in range(0, 1200, 5)]
+        self.ciphertexts = [
+            cipher_message(plaintext, self.key, self.cylinder)
+            for plaintext in self.plaintexts
+        ]
+
+    def test_best_assignment(self):
+        # Greedily taking the best score of the first row would lose 8
+        scores = [[10, 9, 0], [9, 0, 1]]
+        self.assertEqual(best_assignment(scores), [1, 0])
+        with patch.object(depth_attack, 'HAS_NUMPY', False):
+            self.assertEqual(best_assignment(scores), [1, 0])
+
+    def test_known_plaintexts(self):
+        plaintexts = [self.plaintexts[0], self.plaintexts[1][:4] + '??']
+        attack = recover_key(self.ciphertexts[:2], self.cylinder, plaintexts)
+        self.assertTrue(attack['consistent'])
+        self.assertEqual(attack['score'], 0)
+        for position, disk in enumerate(self.key[:12]):
+            self.assertIn(disk, attack['candidates'][position])
+        # Candidates are intersected across the messages
+        alone = recover_key(self.ciphertexts[:1], self.cylinder,
+                            plaintexts[:1])
+        for position in range(12):
+            self.assertLessEqual(set(attack['candidates'][position]),
+                                 set(alone['candidates'][position]))
+
+        plaintexts = self.plaintexts[:5]
+        attack = recover_key(self.ciphertexts[:5], self.cylinder, plaintexts)
+        self.assertEqual(attack['key'], self.key[:12])
+
+    def test_inconsistent_plaintexts(self):
+        plaintexts = [self.plaintexts[1]] + self.plaintexts[1:5]
+        attack = recover_key(self.ciphertexts[:5], self.cylinder, plaintexts)
+        self.assertFalse(attack['consistent'])
+        self.assertEqual(attack['key'], self.key[:12])
+
+    def test_ciphertexts_only(self):
+        attack = recover_key(self.ciphertexts, self.cylinder)
+        self.assertEqual(attack['key'], self.key[:12])
+        self.assertNotIn('candidates', attack)
+
+    def test_without_numpy(self):
+        with patch.object(depth_attack, 'HAS_NUMPY', False):
+            attack = recover_key(self.ciphertexts, self.cylinder)
+            with_plaintexts = recover_key(self.ciphertexts[:5], self.cylinder,
+                                          self.plaintexts[:5])
+        self.assertEqual(attack['key'], self.key[:12])
+        self.assertEqual(with_plaintexts['key'], self.key[:12])
+
+    def test_workers(self):
+        with patch.object(depth_attack, 'PARALLEL_LETTERS', 0), \
+                patch.object(depth_attack, 'PARALLEL_SCORES', 0):
+            attack = recover_key(self.ciphertexts, self.cylinder, workers=2)
+        self.assertEqual(attack, recover_key(self.ciphertexts, self.cylinder))
+
+    def test_messages_too_long(self):
+        with self.assertRaises(ValueError):
+            recover_key([self.ciphertexts[0] * 2], self.cylinder)
+        self.assertEqual(recover_key([], self.cylinder)['key'], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
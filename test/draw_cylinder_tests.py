@@ -0,0 +1,78 @@
+import unittest
+from os import environ
+from tempfile import TemporaryDirectory
+
+import pygame
+
+from component.draw_cylinder import (DISK_STRIPS, SHOWN_OFFSETS, ease_offset,
+                                     get_disk_strip)
+from component.rotate_disk import rotate_disk_from_cylinder_in_place
+from fixtures import CYLINDER
+
+DIMENSIONS = (270.0, 900.0)
+
+
+class DrawCylinderTests(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory()
+        environ['JEFFERSON_CACHE_DIR'] = self.cache_dir.name
+        environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.font.init()
+        self.cylinder = dict(CYLINDER)
+        DISK_STRIPS.clear()
+        SHOWN_OFFSETS.clear()
+
+    def tearDown(self):
+        del environ['JEFFERSON_CACHE_DIR']
+        self.cache_dir.cleanup()
+
+    def test_get_disk_strip(self):
+        strip, offset = get_disk_strip(2, self.cylinder[2], DIMENSIONS)
+        self.assertEqual(offset, 0)
+        self.assertEqual(strip.get_size(), (270, 1800))
+
+        rotate_disk_from_cylinder_in_place(self.cylinder, 2)
+        rotated_strip, offset = get_disk_strip(2, self.cylinder[2],
+                                               DIMENSIONS)
+        self.assertIs(rotated_strip, strip)
+        self.assertEqual(offset, 1)
+
+        for _ in range(2):
+            rotate_disk_from_cylinder_in_place(self.cylinder, 2, False)
+        rotated_strip, offset = get_disk_strip(2, self.cylinder[2],
+                                               DIMENSIONS)
+        self.assertIs(rotated_strip, strip)
+        self.assertEqual(offset, 25)
+
+    def test_get_disk_strip_resized(self):
+        strip, _ = get_disk_strip(2, self.cylinder[2], DIMENSIONS)
+        rotate_disk_from_cylinder_in_place(self.cylinder, 2)
+        SHOWN_OFFSETS[2] = 1
+
+        resized_strip, offset = get_disk_strip(2, self.cylinder[2],
+                                               (300.0, 1000.0))
+        self.assertIsNot(resized_strip, strip)
+        self.assertEqual(resized_strip.get_size(), (300, 2000))
+        self.assertEqual(offset, 0)
+        self.assertEqual(SHOWN_OFFSETS[2], 0)
+
+    def test_ease_offset_wraparound(self):
+        SHOWN_OFFSETS[2] = 25
+        shown_offsets = []
+        while not shown_offsets or shown_offsets[-1] != 0:
+            shown_offsets.append(ease_offset(2, 0))
+            self.assertLess(len(shown_offsets), 26)
+
+        self.assertEqual(shown_offsets[0], 25.5)
+        self.assertTrue(all(25 < shown_offset < 26
+                            for shown_offset in shown_offsets[:-1]))
+        self.assertEqual(shown_offsets[-1], 0)
+        self.assertEqual(ease_offset(2, 0), 0)
+
+    def test_ease_offset_first_frame(self):
+        self.assertEqual(ease_offset(3, 7), 7)
+        self.assertEqual(SHOWN_OFFSETS[3], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+from os import environ, remove
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import engine_metrics
+import kernel_dispatch
+from cylinder_tables import cipher_message_with_tables, prepare_cylinder
+from engine_metrics import (add_hook, disable_metrics, enable_metrics,
+                            export_metrics, instrumented, merge_metrics,
+                            remove_hook, reset_metrics, stats_snapshot,
+                            write_prometheus_textfile)
+from fixtures import CYLINDER, KEY
+from JeffersonBatch import run_batch
+from JeffersonShell import (InvalidKeyError, cipher_message, decipher_message,
+                            load_cylinder_from_file, write_cylinder_to_file)
+
+
+class EngineMetricsTests(unittest.TestCase):
+    def setUp(self):
+        reset_metrics()
+
+    def tearDown(self):
+        disable_metrics()
+        reset_metrics()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(engine_metrics.ENABLED)
+        cipher_message("en ?J oy", KEY, CYLINDER)
+        self.assertEqual(stats_snapshot(), {'counters': {}, 'histograms': {}})
+
+    def test_counters_and_histograms(self):
+        enable_metrics()
+        cipher_message("en ?J oy", KEY, CYLINDER)
+        decipher_message("VMNFJ", KEY, CYLINDER)
+        with self.assertRaises(InvalidKeyError):
+            cipher_message("en ?J oy", [3, 3, 5, 1, 4], CYLINDER)
+
+        file = 'cylinder_metrics_test.txt'
+        write_cylinder_to_file(file, 4)
+        load_cylinder_from_file(file=file)
+        remove(file)
+
+        snapshot = stats_snapshot()
+        self.assertEqual(snapshot['counters'], {
+            'encrypted_messages_total': 1,
+            'encrypted_letters_total': 5,
+            'encrypt_errors_total': 1,
+            'decrypted_messages_total': 1,
+            'decrypted_letters_total': 5,
+            'sanitized_messages_total': 1,
+            'sanitized_letters_total': 5,
+            'key_validations_total': 3,
+            'key_validation_failures_total': 1,
+            'cylinder_loads_total': 1,
+            'cylinder_disks_loaded_total': 4,
+            'cylinder_bytes_loaded_total': 4 * 27
+        })
+        encrypt = snapshot['histograms']['encrypt_seconds']
+        self.assertEqual(encrypt['count'], 2)
+        self.assertEqual(encrypt['buckets'][10.0], 2)
+        self.assertIn('cylinder_load_seconds', snapshot['histograms'])
+
+    def test_hooks(self):
+        calls = []
+
+        def hook(step, fields):
+            calls.append((step, fields))
+
+        add_hook(hook)
+        enable_metrics()
+        cipher_message("enjoy", KEY, CYLINDER)
+        remove_hook(hook)
+        cipher_message("enjoy", KEY, CYLINDER)
+
+        self.assertEqual([step for step, _ in calls],
+                         ['key_validation', 'sanitize', 'encrypt'])
+        self.assertEqual(calls[2][1]['encrypted_letters_total'], 5)
+        self.assertGreaterEqual(calls[2][1]['seconds'], 0)
+
+    def test_failing_counters(self):
+        @instrumented('broken', lambda arguments, result: {
+            'broken_total': arguments['missing']
+        })
+        def double(n):
+            return 2 * n
+
+        enable_metrics()
+        with self.assertLogs('engine_metrics', 'ERROR'):
+            self.assertEqual(double(n=4), 8)
+        self.assertEqual(stats_snapshot()['counters'], {})
+        self.assertEqual(
+            stats_snapshot()['histograms']['broken_seconds']['count'], 1)
+
+    def test_failing_hook(self):
+        def hook(step, fields):
+            raise RuntimeError("broken tracer")
+
+        add_hook(hook)
+        enable_metrics()
+        try:
+            with self.assertLogs('engine_metrics', 'ERROR'):
+                self.assertEqual(
+                    cipher_message("enjoy", KEY, CYLINDER),
+                    "VMNFJ")
+                with self.assertRaises(InvalidKeyError):
+                    cipher_message("enjoy", [3, 3, 5, 1, 4], CYLINDER)
+        finally:
+            remove_hook(hook)
+
+    def test_table_kernel(self):
+        enable_metrics()
+        with prepare_cylinder(CYLINDER) as tables:
+            cipher_message_with_tables("enjoy", KEY, tables)
+        self.assertEqual(stats_snapshot()['counters']['encrypted_letters_total'],
+                         5)
+
+    def test_export_and_merge(self):
+        enable_metrics()
+        cipher_message("enjoy", KEY, CYLINDER)
+        exported = export_metrics()
+        merge_metrics(exported)
+        snapshot = stats_snapshot()
+        self.assertEqual(snapshot['counters']['encrypted_messages_total'], 2)
+        self.assertEqual(snapshot['histograms']['encrypt_seconds']['count'],
+                         2)
+
+    def test_batch_workers_metrics(self):
+        file = 'cylinder_metrics_test.txt'
+        with open(file, 'w') as f:
+            f.write('\n'.join(CYLINDER.values()) + '\n')
+        enable_metrics()
+        jobs = [
+            '{"operation": "encrypt", "message": "enjoy", '
+            '"key": [3, 2, 5, 1, %d], "cylinder": "%s"}\n' % (4 + i % 2, file)
+            for i in range(4)
+        ]
+        # The calibration done first is not counted
+        with TemporaryDirectory() as cache_dir, \
+                patch.dict(environ, {'JEFFERSON_CACHE_DIR': cache_dir}), \
+                patch.object(kernel_dispatch, 'CALIBRATION', None):
+            environ.pop('JEFFERSON_KERNEL', None)
+            results = list(run_batch(jobs, workers=2, chunk_size=1))
+        remove(file)
+
+        self.assertEqual([result['ok'] for result in results],
+                         [True, False, True, False])
+        counters = stats_snapshot()['counters']
+        self.assertEqual(counters['encrypted_messages_total'], 2)
+        self.assertEqual(counters['encrypt_errors_total'], 2)
+        self.assertEqual(counters['cylinder_loads_total'], 1)
+
+    def test_write_prometheus_textfile(self):
+        enable_metrics()
+        cipher_message("enjoy", KEY, CYLINDER)
+        file = 'metrics_test.prom'
+        write_prometheus_textfile(file)
+        with open(file, 'r') as f:
+            text = f.read()
+        remove(file)
+
+        self.assertIn('# TYPE jefferson_encrypted_messages_total counter\n'
+                      'jefferson_encrypted_messages_total 1\n', text)
+        self.assertIn('# TYPE jefferson_encrypt_seconds histogram\n', text)
+        self.assertIn('jefferson_encrypt_seconds_bucket{le="+Inf"} 1\n', text)
+        self.assertIn('jefferson_encrypt_seconds_count 1\n', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
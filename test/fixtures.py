@@ -0,0 +1,11 @@
+"""Data shared by the test files."""
+
+# A small cylinder of 5 disks, along with a key for it
+CYLINDER = {
+    1: "FEWPQLHBDSMCNAXIJTKUOZYVRG",
+    2: "UGWAEIXHTOVRKSQBNJPCYFMDLZ",
+    3: "BVWYUZKLGQXHJOTDSMNRIECPFA",
+    4: "UJEDQRSHOCFBWANMITXPZYKVLG",
+    5: "JBFULONATYWEHRPZVXSCKDIGQM"
+}
+KEY = [3, 2, 5, 1, 4]
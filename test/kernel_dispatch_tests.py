@@ -0,0 +1,109 @@
+import unittest
+from os import environ
+from os.path import join
+from random import seed
+from tempfile import TemporaryDirectory
+
+import kernel_dispatch
+from fixtures import CYLINDER
+from JeffersonShell import (InvalidKeyError, cipher_message, generate_disk,
+                            generate_key, sanitize_message)
+from kernel_dispatch import (available_kernels, cipher_messages, calibrate,
+                             decipher_messages, get_calibration,
+                             load_calibration, save_calibration,
+                             select_kernel)
+from vectorized_cipher import HAS_NUMPY
+
+
+class KernelDispatchTests(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory()
+        environ['JEFFERSON_CACHE_DIR'] = self.cache_dir.name
+        environ.pop('JEFFERSON_KERNEL', None)
+        kernel_dispatch.CALIBRATION = None
+
+    def tearDown(self):
+        kernel_dispatch.CALIBRATION = None
+        environ.pop('JEFFERSON_KERNEL', None)
+        del environ['JEFFERSON_CACHE_DIR']
+        self.cache_dir.cleanup()
+
+    def test_available_kernels(self):
+        kernels = available_kernels()
+        self.assertIn('reference', kernels)
+        self.assertIn('table', kernels)
+        self.assertEqual('vectorized' in kernels, HAS_NUMPY)
+
+    def test_kernels_agree(self):
+        seed(28)
+        cylinder = {i: generate_disk() for i in range(1, 41)}
+        key = generate_key(40)
+        messages = ["en ?J oy", "", "The quick brown fox jumps over the dog",
+                    "Hello world"]
+        ciphered = [cipher_message(m, key, cylinder) for m in messages]
+        odd = decipher_messages(["A?Z"], key, cylinder, 'reference')
+        for kernel in available_kernels():
+            self.assertEqual(
+                cipher_messages(messages, key, cylinder, kernel), ciphered)
+            self.assertEqual(
+                decipher_messages(ciphered, key, cylinder, kernel),
+                [sanitize_message(m) for m in messages])
+            self.assertEqual(
+                decipher_messages(["A?Z"], key, cylinder, kernel), odd)
+
+    def test_kernels_reject_invalid_keys(self):
+        for kernel in available_kernels():
+            with self.assertRaises(InvalidKeyError):
+                cipher_messages(["ENJOY"], [1, 1, 2, 3, 4], CYLINDER, kernel)
+
+    def test_table_kernel_prepares_used_disks_only(self):
+        cylinder = dict(CYLINDER)
+        cylinder[6] = "not a disk"
+        key = [3, 2, 5, 1, 4, 6]
+        self.assertEqual(
+            cipher_messages(["enjoy"], key, cylinder, 'table'),
+            [cipher_message("enjoy", key, cylinder)])
+
+    def test_forced_kernel(self):
+        environ['JEFFERSON_KERNEL'] = 'reference'
+        self.assertEqual(select_kernel(10000, 10000), 'reference')
+        self.assertIsNone(kernel_dispatch.CALIBRATION)
+
+        environ['JEFFERSON_KERNEL'] = 'teleportation'
+        with self.assertRaises(ValueError):
+            select_kernel(1, 1)
+
+    def test_calibration_is_cached(self):
+        calibration = get_calibration()
+        for row in calibration['fastest']:
+            for kernel in row:
+                self.assertIn(kernel, available_kernels())
+
+        file = join(self.cache_dir.name, 'kernel-calibration.json')
+        self.assertEqual(load_calibration(file), calibration)
+
+        calibration['environment']['python'] = 'Python 1.0'
+        save_calibration(calibration, file)
+        self.assertIsNone(load_calibration(file))
+
+    def test_unusable_cache_dir(self):
+        file = join(self.cache_dir.name, 'not-a-directory')
+        open(file, 'w').close()
+        environ['JEFFERSON_CACHE_DIR'] = join(file, 'cache')
+        calibration = get_calibration()
+        self.assertEqual(len(calibration['fastest']),
+                         len(calibration['lengths']))
+
+    def test_select_kernel(self):
+        calibration = calibrate()
+        calibration['fastest'] = [['reference', 'reference', 'table'],
+                                  ['reference', 'table', 'table'],
+                                  ['table', 'table', 'vectorized']]
+        kernel_dispatch.CALIBRATION = calibration
+        self.assertEqual(select_kernel(3, 1), 'reference')
+        self.assertEqual(select_kernel(70, 10), 'table')
+        self.assertEqual(select_kernel(10000, 10000), 'vectorized')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from os import environ, remove
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import pygame
+
+import component.message_preview as message_preview
+from component.exit_button import retrieve_line_from_cylinder
+from component.message_preview import (MINIMUM_FONT_SIZE, OVERFLOW_MARKER,
+                                       generate_message_preview_data,
+                                       is_shown, update_message_preview,
+                                       write_ciphered_message_to_file)
+from component.rotate_disk import rotate_disk_from_cylinder_in_place
+from fixtures import CYLINDER, KEY
+
+
+class MessagePreviewTests(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory()
+        environ['JEFFERSON_CACHE_DIR'] = self.cache_dir.name
+        environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.font.init()
+        self.cylinder = dict(CYLINDER)
+        self.window = pygame.Surface((1500, 1000))
+        self.preview_data = generate_message_preview_data(
+            self.cylinder, KEY, self.window)
+
+    def tearDown(self):
+        del environ['JEFFERSON_CACHE_DIR']
+        self.cache_dir.cleanup()
+
+    def check_messages(self):
+        self.assertEqual(self.preview_data['clear'],
+                         retrieve_line_from_cylinder(self.cylinder, KEY, 9))
+        self.assertEqual(self.preview_data['ciphered'],
+                         retrieve_line_from_cylinder(self.cylinder, KEY, 15))
+
+    def test_generate_message_preview_data(self):
+        self.check_messages()
+        self.assertEqual(self.preview_data['pos'], (1350, 0))
+        self.assertEqual(self.preview_data['locations'][5], 2)
+
+    def test_update_message_preview(self):
+        rotate_disk_from_cylinder_in_place(self.cylinder, 5, False)
+        with patch.object(message_preview, 'render_letter') as render_letter:
+            update_message_preview(self.preview_data, self.cylinder, 5)
+        self.check_messages()
+        self.assertEqual(
+            [call[0][1:] for call in render_letter.call_args_list],
+            [(0, 2), (1, 2)])
+
+    def test_write_ciphered_message_to_file(self):
+        file = 'message_preview_test.txt'
+        write_ciphered_message_to_file(self.preview_data, file)
+        with open(file, 'r') as f:
+            self.assertEqual(f.read(), ''.join(
+                retrieve_line_from_cylinder(self.cylinder, KEY, 15)))
+        remove(file)
+
+    def test_fits_long_cylinders(self):
+        cylinder = {i: CYLINDER[i % 5 + 1] for i in range(1, 201)}
+        preview_data = generate_message_preview_data(
+            cylinder, list(range(1, 201)), self.window)
+        self.assertLess(preview_data['font_size'],
+                        self.preview_data['font_size'])
+        self.assertTrue(all(is_shown(preview_data, i) for i in range(200)))
+
+    def test_overflowing_letters(self):
+        cylinder = {i: CYLINDER[i % 5 + 1] for i in range(1, 1001)}
+        key = list(range(1, 1001))
+        with patch.object(message_preview, 'render_cell') as render_cell:
+            preview_data = generate_message_preview_data(
+                cylinder, key, self.window)
+        capacity = preview_data['capacity']
+        self.assertEqual(preview_data['font_size'], MINIMUM_FONT_SIZE)
+        self.assertLess(capacity, 1000)
+        self.assertTrue(is_shown(preview_data, capacity - 2))
+        self.assertFalse(is_shown(preview_data, capacity - 1))
+        self.assertIn((1, capacity - 1, OVERFLOW_MARKER),
+                      [call[0][1:] for call in render_cell.call_args_list])
+
+        # Rotating a hidden disk scrolls to it
+        rotate_disk_from_cylinder_in_place(cylinder, 1000, False)
+        with patch.object(message_preview, 'render_cell') as render_cell:
+            update_message_preview(preview_data, cylinder, 1000)
+        self.assertEqual(preview_data['first'], 1000 - capacity)
+        self.assertTrue(is_shown(preview_data, 999))
+        self.assertFalse(is_shown(preview_data, 1000 - capacity))
+        cells = [call[0][1:] for call in render_cell.call_args_list]
+        self.assertIn((0, 0, OVERFLOW_MARKER), cells)
+        self.assertIn((1, capacity - 1, cylinder[1000][15]), cells)
+        self.assertEqual(preview_data['ciphered'][999], cylinder[1000][15])
+
+
+if __name__ == "__main__":
+    unittest.main()
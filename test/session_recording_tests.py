@@ -0,0 +1,58 @@
+import unittest
+from os import remove
+
+from session_recording import (frame_times_report, load_recording,
+                               percentile, record_event, start_recording)
+
+
+class SessionRecordingTests(unittest.TestCase):
+    def test_record_and_load(self):
+        file = 'session_test.jsonl'
+        recording = start_recording(file, (1500, 1000), 36)
+        record_event(recording, 3, 0.25, 'mouse_up', pos=[10, 20], button=1)
+        record_event(recording, 3, 0.2500001, 'mouse_up', pos=[30, 40],
+                     button=3)
+        record_event(recording, 9, 1.5, 'quit')
+        recording.close()
+
+        header, events_by_frame = load_recording(file)
+        remove(file)
+        self.assertEqual(header, {
+            'version': 1,
+            'window': [1500, 1000],
+            'disks': 36
+        })
+        self.assertEqual(sorted(events_by_frame), [3, 9])
+        self.assertEqual(events_by_frame[3][0], {
+            'frame': 3,
+            'time': 0.25,
+            'type': 'mouse_up',
+            'pos': [10, 20],
+            'button': 1
+        })
+        self.assertEqual(events_by_frame[3][1]['button'], 3)
+        self.assertEqual(events_by_frame[9][0]['type'], 'quit')
+
+    def test_load_rejects_other_files(self):
+        file = 'session_test.jsonl'
+        with open(file, 'w') as f:
+            f.write('{"operation": "encrypt"}\n')
+        with self.assertRaises(ValueError):
+            load_recording(file)
+        remove(file)
+
+    def test_percentile(self):
+        ordered = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+        self.assertEqual(percentile(ordered, 0), 1)
+        self.assertEqual(percentile(ordered, 50), 6)
+        self.assertEqual(percentile(ordered, 100), 11)
+
+    def test_frame_times_report(self):
+        self.assertEqual(frame_times_report(0, []), "No frame replayed.")
+        report = frame_times_report(0.01, [0.002, 0.004, 0.004])
+        self.assertTrue(report.startswith("3 frames replayed in 10.0 ms"))
+        self.assertIn("max 4.00 ms", report)
+
+
+if __name__ == "__main__":
+    unittest.main()